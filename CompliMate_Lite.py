@@ -1,12 +1,38 @@
 import os
+import re
+import sys
 import json
 import faiss
 import hashlib
 import pickle
+import copy
+import queue
+import asyncio
+import functools
+import itertools
+import math
+import multiprocessing
+import threading
+import weakref
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+import time
+import cProfile
+import pstats
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, Future
+from contextlib import contextmanager
 from docx import Document
+from docx.table import Table
+from docx.text.paragraph import Paragraph
 from pdf2docx import Converter
 from sentence_transformers import SentenceTransformer
 from difflib import SequenceMatcher
+from bisect import bisect_right
+from collections import namedtuple, OrderedDict, deque
 
 # ------------------------
 # Tunable thresholds / constants
@@ -14,6 +40,694 @@ from difflib import SequenceMatcher
 HEADING_FUZZY_THRESHOLD = 0.8
 KEYWORD_SIM_THRESHOLD = 0.6
 
+# FAISS backends for the section/paragraph indexes and their tunables
+INDEX_BACKENDS = ("flat", "hnsw", "ivf_flat", "ivf_pq")
+INDEX_STORAGE = ("float32", "fp16", "int8", "pq")  # how vectors are stored inside the backend
+DEFAULT_INDEX_PARAMS = {
+    "storage": "float32",    # one of INDEX_STORAGE (ivf_pq always stores PQ codes)
+    "rerank": 0,             # re-score this many candidates with exact vectors from the embedding cache
+    "section_candidates": 0, # two-stage search: best sections first, then only their paragraphs (0 -> off)
+    "hnsw_m": 32,            # HNSW graph degree
+    "ef_construction": 80,   # HNSW build-time beam width
+    "ef_search": 64,         # HNSW query-time beam width
+    "nlist": None,           # IVF cells (None -> ~4*sqrt(n), capped for small corpora)
+    "nprobe": 16,            # IVF cells visited per query
+    "pq_m": None,            # PQ sub-quantizers (None -> largest of 48/32/24/16/8 dividing dim)
+    "pq_bits": 8,            # bits per PQ code
+}
+# params that change what is stored; search-time params can change without a rebuild
+INDEX_BUILD_PARAMS = ("storage", "hnsw_m", "ef_construction", "nlist", "pq_m", "pq_bits")
+
+# Lexical (BM25) paragraph retrieval, fused with the dense search by reciprocal rank
+BM25_K1 = 1.2
+BM25_B = 0.75
+RRF_K = 60
+EXACT_TERM_MAX_TOKENS = 3  # short queries naming an identifier ("Rule 116", "Form XIV") skip the dense search
+
+# update_index re-deduplicates the paragraph text blob once this share of it is dead
+COMPACT_DEAD_FRACTION = 0.25
+
+# Change detection for source and role files: processed_lite.json keeps each file's size,
+# mtime and content digest, and a file is only read again when its size or mtime moves
+FILE_DIGEST = "sha1"          # content digest (change detection only, not a security boundary)
+HASH_BUFFER_SIZE = 1 << 20    # bytes per read while hashing
+RACY_MTIME_NS = 2 * 10 ** 9   # a file modified this close to its last hash is hashed again next scan
+# The ingestion pool is usually started from a background thread of a multi-threaded process
+# (indexer, encoder, torch threads), where forking can deadlock the child; workers start from
+# a clean forkserver process instead, or are spawned where there is none
+INGEST_START_METHOD = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+
+# ------------------------
+# Result records
+# ------------------------
+
+# One retrieval hit; section content is fetched separately with get_section(section_id).
+# phase is "fuzzy" (heading match, score = SequenceMatcher ratio), "semantic" (paragraph
+# match of the dense search) or "lexical" (paragraph match found by BM25 only). Paragraph
+# scores are cosine similarities, or reciprocal-rank fusion scores in hybrid mode.
+SearchHit = namedtuple("SearchHit", ["filename", "heading", "section_id", "score", "phase", "access_tag"])
+
+# Vector ids a search is restricted to (ascending) and a FAISS selector over them
+# (None when nothing is excluded); bitmap backs the selector's memory.
+_IdFilter = namedtuple("_IdFilter", ["ids", "selector", "bitmap"])
+# What one role may read: a mask over paragraph store positions and _IdFilters over
+# the paragraph and section vectors.
+_RoleFilter = namedtuple("_RoleFilter", ["mask", "paragraphs", "sections"])
+# Precomputed authorization: the roles signature it was built for, per-role keyword
+# postings, and heading -> True (shared) or frozenset of authorized roles. Published
+# as one object so readers never see a half-built table.
+_AuthIndex = namedtuple("_AuthIndex", ["signature", "postings", "decisions"])
+
+# ------------------------
+# Paragraph store
+# ------------------------
+
+class ParagraphStore:
+    """Columnar paragraph store.
+       Per paragraph it keeps the vector id, the id of its section (filename, heading and
+       access tag live on the section), a slice of one UTF-8 text blob (identical texts
+       share a slice) and the text's embedding cache key. Each column is saved as a .npy
+       file and loaded memory-mapped, so opening a store does not deserialize the paragraphs."""
+    __slots__ = ("ids", "section_ids", "starts", "lengths", "blob", "keys", "_dead")
+    COLUMNS = ("ids", "section_ids", "starts", "lengths", "blob", "keys")
+
+    def __init__(self, ids=None, section_ids=None, starts=None, lengths=None, blob=None, keys=None, dead=None):
+        self.ids = np.empty(0, dtype="int64") if ids is None else ids  # ascending
+        self.section_ids = np.empty(0, dtype="int64") if section_ids is None else section_ids
+        self.starts = np.empty(0, dtype="int64") if starts is None else starts
+        self.lengths = np.empty(0, dtype="int64") if lengths is None else lengths
+        self.blob = np.empty(0, dtype="uint8") if blob is None else blob
+        self.keys = np.empty(0, dtype=_DigestIndex.DTYPE) if keys is None else keys  # _text_digest per paragraph
+        self._dead = 0 if blob is None else dead  # see dead_bytes(); None -> not counted yet
+
+    @classmethod
+    def build(cls, ids, section_ids, texts, keys=None):
+        if keys is None:
+            keys = [_text_digest(t) for t in texts]
+        return cls._from_bytes(ids, section_ids, (t.encode("utf-8") for t in texts), keys)
+
+    @classmethod
+    def _from_bytes(cls, ids, section_ids, chunks, keys):
+        blob = bytearray()
+        slices = {}
+        starts, lengths = [], []
+        for data in chunks:
+            if data not in slices:
+                slices[data] = len(blob)
+                blob += data
+            starts.append(slices[data])
+            lengths.append(len(data))
+        return cls(np.asarray(ids, dtype="int64"), np.asarray(section_ids, dtype="int64"),
+                   np.asarray(starts, dtype="int64"), np.asarray(lengths, dtype="int64"),
+                   np.frombuffer(bytes(blob), dtype="uint8"), np.asarray(keys, dtype=_DigestIndex.DTYPE), dead=0)
+
+    @classmethod
+    def concat(cls, stores):
+        stores = [s for s in stores if len(s)]
+        if not stores:
+            return cls()
+        offsets = np.cumsum([0] + [len(s.blob) for s in stores[:-1]])
+        dead = [s._dead for s in stores]
+        return cls(np.concatenate([s.ids for s in stores]),
+                   np.concatenate([s.section_ids for s in stores]),
+                   np.concatenate([s.starts + off for s, off in zip(stores, offsets)]),
+                   np.concatenate([s.lengths for s in stores]),
+                   np.concatenate([s.blob for s in stores]),
+                   np.concatenate([s.keys for s in stores]),
+                   dead=None if None in dead else sum(dead))
+
+    def subset(self, mask):
+        # the dropped paragraphs' bytes count as dead (too many if they shared a text with a kept one)
+        dead = None if self._dead is None else self._dead + int(np.asarray(self.lengths)[~mask].sum())
+        return ParagraphStore(self.ids[mask], self.section_ids[mask], self.starts[mask],
+                              self.lengths[mask], self.blob, self.keys[mask], dead=dead)
+
+    def dead_bytes(self):
+        """Blob bytes left behind by removed paragraphs. Tracked through subset() and
+           concat(); a loaded store counts its unreferenced slices once, on first use."""
+        if self._dead is None:
+            lengths = np.asarray(self.lengths)
+            used = lengths > 0
+            _, first = np.unique(np.asarray(self.starts)[used], return_index=True)
+            self._dead = len(self.blob) - int(lengths[used][first].sum())
+        return self._dead
+
+    def compact(self):
+        # re-deduplicate texts and drop blob bytes no paragraph refers to; O(store), so
+        # update_index only calls it once dead_bytes() passes COMPACT_DEAD_FRACTION
+        return ParagraphStore._from_bytes(self.ids, self.section_ids,
+                                          (self._bytes(pos) for pos in range(len(self))), self.keys)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def _bytes(self, pos):
+        start = int(self.starts[pos])
+        return self.blob[start:start + int(self.lengths[pos])].tobytes()
+
+    def text(self, pos):
+        return self._bytes(pos).decode("utf-8")
+
+    def texts(self):
+        return [self.text(pos) for pos in range(len(self))]
+
+    def position(self, vector_id):
+        pos = int(np.searchsorted(self.ids, vector_id))
+        return pos if pos < len(self.ids) and self.ids[pos] == vector_id else None
+
+    @staticmethod
+    def path(prefix, col):
+        return f"{prefix}_{col}.npy"
+
+    @classmethod
+    def paths(cls, prefix):
+        # the files a saved store needs; keys is derived for stores saved without it
+        return [cls.path(prefix, col) for col in cls.COLUMNS if col != "keys"]
+
+    def save(self, prefix, write_array):
+        for col in self.COLUMNS:
+            write_array(self.path(prefix, col), getattr(self, col))
+
+    @classmethod
+    def load(cls, prefix, mmap=True):
+        mode = "r" if mmap else None
+        store = cls(*[np.load(path, mmap_mode=mode) for path in cls.paths(prefix)])
+        if os.path.exists(cls.path(prefix, "keys")):
+            store.keys = np.load(cls.path(prefix, "keys"), mmap_mode=mode)
+        else:
+            store.keys = np.array([_text_digest(store.text(pos)) for pos in range(len(store))],
+                                  dtype=_DigestIndex.DTYPE)
+        n = len(store.ids)
+        if not (len(store.section_ids) == len(store.starts) == len(store.lengths) == len(store.keys) == n):
+            raise ValueError("paragraph store columns have different lengths")
+        return store
+
+
+# ------------------------
+# Lexical index
+# ------------------------
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+_ROMAN_RE = re.compile(r"m{0,4}(cm|cd|d?c{0,3})(xc|xl|l?x{0,3})(ix|iv|v?i{0,3})")
+
+
+def _lexical_tokens(text):
+    # lowercase ASCII words and numbers, capped at the width of the stored vocabulary
+    return [t[:LexicalIndex.TERM_BYTES] for t in _TOKEN_RE.findall(text.lower())]
+
+
+_IDENTIFIER_PREFIXES = frozenset({"form", "forms", "rule", "rules", "class", "schedule", "schedules"})
+
+
+def _has_identifier(tokens):
+    # a number ("116"), or a roman numeral / class letter right after form, rule, class or
+    # schedule ("form xiv", "class b"); a lone "i", "mix" or possessive "s" is not one
+    for prev, token in zip([None] + tokens[:-1], tokens):
+        if any(c.isdigit() for c in token):
+            return True
+        if prev in _IDENTIFIER_PREFIXES and (len(token) == 1 or _ROMAN_RE.fullmatch(token)):
+            return True
+    return False
+
+
+class LexicalIndex:
+    """BM25 inverted index over the paragraph store, row for row.
+       Terms are sorted fixed-width byte strings; each term's postings (paragraph
+       positions, term frequencies and their precomputed BM25 term weights) are one slice
+       of the docs / tf / weights columns. Columns are saved as .npy files and loaded
+       memory-mapped."""
+    __slots__ = ("ids", "terms", "offsets", "docs", "tf", "weights", "idf", "lengths")
+    COLUMNS = ("ids", "terms", "offsets", "docs", "tf", "weights", "idf", "lengths")
+    TERM_BYTES = 32
+
+    def __init__(self, ids=None, terms=None, offsets=None, docs=None, tf=None, weights=None, idf=None, lengths=None):
+        self.ids = np.empty(0, dtype="int64") if ids is None else ids  # paragraph vector ids, as in the store
+        self.terms = np.empty(0, dtype=f"S{self.TERM_BYTES}") if terms is None else terms
+        self.offsets = np.zeros(1, dtype="int64") if offsets is None else offsets
+        self.docs = np.empty(0, dtype="int32") if docs is None else docs
+        self.tf = np.empty(0, dtype="int32") if tf is None else tf
+        self.weights = np.empty(0, dtype="float32") if weights is None else weights
+        self.idf = np.empty(0, dtype="float32") if idf is None else idf
+        self.lengths = np.zeros(len(self.ids), dtype="int32") if lengths is None else lengths  # tokens per paragraph
+
+    @classmethod
+    def build(cls, store):
+        return cls().merge(store, 0)
+
+    def merge(self, store, first_new):
+        """Index for store, which holds this index's paragraphs with vector ids below
+           first_new (less any removed since) plus new paragraphs. Only paragraphs this
+           index does not cover are tokenized; kept postings move to their new positions.
+           idf and the average paragraph length are corpus-wide, so all weights are
+           recomputed, a vectorized pass over the postings."""
+        ids = np.array(store.ids, dtype="int64")
+        n = len(ids)
+        # paragraphs of this index still in the store, and their positions there
+        moved = np.searchsorted(ids, self.ids)
+        kept = (self.ids < first_new) & (moved < n)
+        kept[kept] = ids[moved[kept]] == self.ids[kept]
+        covered = np.zeros(n, dtype=bool)
+        covered[moved[kept]] = True
+        doc_lens = np.zeros(n, dtype="int64")
+        doc_lens[moved[kept]] = self.lengths[kept]
+        keep = kept[self.docs]
+        old_terms = np.repeat(np.arange(len(self.terms)), np.diff(self.offsets))[keep]
+        old_docs, old_tf = moved[self.docs[keep]], np.asarray(self.tf[keep], dtype="int64")
+
+        vocab = {}
+        term_ids = []
+        fresh = np.flatnonzero(~covered)
+        for pos in fresh:
+            tokens = _lexical_tokens(store.text(pos))
+            doc_lens[pos] = len(tokens)
+            term_ids.extend(vocab.setdefault(t, len(vocab)) for t in tokens)
+        if not len(old_terms) and not vocab:
+            return LexicalIndex(ids=ids, lengths=doc_lens.astype("int32"))
+
+        # one vocabulary for both sides, then one (term, paragraph) key per posting
+        new_terms = np.array([t.encode("ascii") for t in vocab], dtype=self.terms.dtype)
+        terms = np.union1d(self.terms, new_terms)
+        keys = np.searchsorted(terms, new_terms)[np.asarray(term_ids, dtype="int64")] * n + \
+            np.repeat(fresh, doc_lens[fresh])
+        keys, tf = np.unique(keys, return_counts=True)
+        keys = np.concatenate([np.searchsorted(terms, self.terms)[old_terms] * n + old_docs, keys])
+        tf = np.concatenate([old_tf, tf])
+        order = np.argsort(keys, kind="stable")
+        keys, tf = keys[order], tf[order]
+        term_of, docs = np.divmod(keys, n)
+        offsets = np.concatenate([[0], np.cumsum(np.bincount(term_of, minlength=len(terms)))])
+        df = np.diff(offsets)
+        present = df > 0  # terms only removed paragraphs had
+        if not present.all():
+            terms, offsets = terms[present], np.concatenate([[0], np.cumsum(df[present])])
+            df = df[present]
+        idf = np.log(1 + (n - df + 0.5) / (df + 0.5))
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * doc_lens[docs] / max(doc_lens.mean(), 1e-9))
+        weights = tf * (BM25_K1 + 1) / (tf + norm)
+        return LexicalIndex(ids, terms, offsets.astype("int64"), docs.astype("int32"), tf.astype("int32"),
+                            weights.astype("float32"), idf.astype("float32"), doc_lens.astype("int32"))
+
+    def __len__(self):
+        return len(self.ids)
+
+    def matches(self, store):
+        return len(self.ids) == len(store.ids) and np.array_equal(self.ids, store.ids)
+
+    def search(self, tokens, top_k, mask=None):
+        """[(BM25 score, paragraph position, all tokens matched)] for the best top_k paragraphs,
+           only among positions where mask is True if a mask is given."""
+        tokens = sorted(set(tokens))
+        if not tokens or not len(self.terms):
+            return []
+        wanted = np.array([t.encode("ascii") for t in tokens], dtype=self.terms.dtype)
+        rows = np.searchsorted(self.terms, wanted)
+        rows = rows[(rows < len(self.terms)) & (self.terms[np.minimum(rows, len(self.terms) - 1)] == wanted)]
+        if not len(rows):
+            return []
+        docs = np.concatenate([self.docs[self.offsets[r]:self.offsets[r + 1]] for r in rows])
+        scores = np.concatenate([self.weights[self.offsets[r]:self.offsets[r + 1]] * self.idf[r] for r in rows])
+        if mask is not None:
+            readable = mask[docs]
+            docs, scores = docs[readable], scores[readable]
+        docs, inverse = np.unique(docs, return_inverse=True)
+        totals = np.bincount(inverse, weights=scores)
+        matched = np.bincount(inverse) == len(tokens)
+        order = np.argsort(-totals, kind="stable")[:top_k]
+        return [(float(totals[i]), int(docs[i]), bool(matched[i])) for i in order]
+
+    @classmethod
+    def paths(cls, prefix):
+        return [f"{prefix}_{col}.npy" for col in cls.COLUMNS]
+
+    def save(self, prefix, write_array):
+        for col, path in zip(self.COLUMNS, self.paths(prefix)):
+            write_array(path, getattr(self, col))
+
+    @classmethod
+    def load(cls, prefix, mmap=True):
+        index = cls(*[np.load(path, mmap_mode="r" if mmap else None) for path in cls.paths(prefix)])
+        if (len(index.offsets) != len(index.terms) + 1 or not len(index.docs) == len(index.tf) == len(index.weights)
+                or len(index.lengths) != len(index.ids)):
+            raise ValueError("lexical index columns have inconsistent lengths")
+        return index
+
+
+# ------------------------
+# Embedding cache keys
+# ------------------------
+
+@contextmanager
+def _file_lock(path):
+    # exclusive lock on path, held against other processes and other open handles in this one
+    with open(path, "a+b") as f:
+        if fcntl is not None:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            while True:
+                try:
+                    msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                    break
+                except OSError:  # LK_LOCK gives up after ten seconds
+                    pass
+        try:
+            yield
+        finally:
+            if fcntl is not None:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+def _text_digest(text):
+    # embedding cache key of a text
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=_DigestIndex.DIGEST_BYTES).digest()
+
+
+class _DigestIndex:
+    """Lookup from fixed-width text digests to embedding cache rows.
+       Most keys live in one sorted array searched with np.searchsorted; keys appended
+       since the last merge sit in a dict until they outnumber the sorted part, so
+       appending stays amortized O(log n) per key."""
+    DIGEST_BYTES = 16
+    DTYPE = f"S{DIGEST_BYTES}"
+    MIN_MERGE = 4096
+
+    def __init__(self, digests=None):
+        digests = np.empty(0, dtype=self.DTYPE) if digests is None else np.asarray(digests, dtype=self.DTYPE)
+        self._order = np.argsort(digests, kind="stable")  # sorted slot -> row
+        self._sorted = digests[self._order]
+        self._recent = {}  # digest -> row, appended since the last merge
+        self._count = len(digests)
+
+    def __len__(self):
+        return self._count
+
+    def copy(self):
+        # the sorted arrays are never written in place, only the recent dict is
+        other = _DigestIndex.__new__(_DigestIndex)
+        other._order, other._sorted, other._count = self._order, self._sorted, self._count
+        other._recent = dict(self._recent)
+        return other
+
+    def lookup(self, digests):
+        """Row of every digest, -1 where it is not cached."""
+        digests = np.asarray(digests, dtype=self.DTYPE)
+        rows = np.full(len(digests), -1, dtype="int64")
+        if len(self._sorted) and len(digests):
+            slots = np.minimum(np.searchsorted(self._sorted, digests), len(self._sorted) - 1)
+            found = self._sorted[slots] == digests
+            rows[found] = self._order[slots[found]]
+        if self._recent:
+            for i in np.flatnonzero(rows < 0):
+                rows[i] = self._recent.get(digests[i], -1)
+        return rows
+
+    def append(self, digests):
+        # rows continue after the current ones, in the given order
+        for digest in np.asarray(digests, dtype=self.DTYPE):
+            self._recent.setdefault(digest, self._count)
+            self._count += 1
+        if len(self._recent) > max(self.MIN_MERGE, len(self._sorted)):
+            keys = np.concatenate([self._sorted, np.array(list(self._recent), dtype=self.DTYPE)])
+            rows = np.concatenate([self._order, np.fromiter(self._recent.values(), dtype="int64",
+                                                            count=len(self._recent))])
+            order = np.argsort(keys, kind="stable")
+            self._sorted, self._order, self._recent = keys[order], rows[order], {}
+
+
+# ------------------------
+# Query caches
+# ------------------------
+
+class _LRUCache:
+    """Thread-safe LRU map with an optional time-to-live and hit/miss counters."""
+
+    def __init__(self, maxsize, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()  # key -> (stored at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and self.ttl is not None and time.monotonic() - item[0] > self.ttl:
+                del self._data[key]
+                item = None
+            if item is None:
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, value):
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._data), "maxsize": self.maxsize}
+
+
+# ------------------------
+# Concurrency helpers
+# ------------------------
+
+class _ReadWriteLock:
+    """Any number of concurrent readers or one writer; a waiting writer holds off new readers.
+       Not reentrant: take it once, in the public entry point."""
+
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._readers = 0
+        self._writer = False
+        self._writers_waiting = 0
+
+    @contextmanager
+    def read(self):
+        with self._cond:
+            while self._writer or self._writers_waiting:
+                self._cond.wait()
+            self._readers += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers -= 1
+                if not self._readers:
+                    self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        with self._cond:
+            self._writers_waiting += 1
+            while self._writer or self._readers:
+                self._cond.wait()
+            self._writers_waiting -= 1
+            self._writer = True
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._writer = False
+                self._cond.notify_all()
+
+
+class _EncodeBatcher:
+    """Embedding scheduler in front of a model's encode.
+       Requests from any thread are split into chunks of at most max_batch texts and
+       queued; one worker thread flushes a batch to the model once it holds max_batch
+       texts or max_wait seconds after its first request. Query encodes (priority 0)
+       are served before ingestion chunks (priority 1). A bound-method encode is held
+       weakly, so the worker never keeps its owner alive; close() stops the worker once
+       the queued requests are served."""
+
+    QUERY, INGEST, _STOP = 0, 1, 2
+
+    def __init__(self, encode, max_batch=64, max_wait=0.002):
+        self._encode = weakref.WeakMethod(encode) if hasattr(encode, "__self__") else (lambda: encode)
+        self.max_batch = max(1, max_batch)
+        self.max_wait = max_wait
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()  # FIFO within a priority
+        self._thread = None
+        self._lock = threading.Lock()
+        self._batch_sizes = {}   # power-of-two bucket -> batches
+        self._queue_depths = {}  # power-of-two bucket -> batches
+        self._batches = 0
+        self._texts = 0
+
+    def encode(self, texts, priority=QUERY):
+        """float32 vectors for texts, computed in batches shared with concurrent callers."""
+        texts = list(texts)
+        if not texts:
+            return np.empty((0, 0), dtype="float32")
+        futures = []
+        for i in range(0, len(texts), self.max_batch):
+            future = Future()
+            self._queue.put((priority, next(self._seq), texts[i:i + self.max_batch], future))
+            futures.append(future)
+        self._ensure_worker()
+        parts = [f.result() for f in futures]
+        return parts[0] if len(parts) == 1 else np.concatenate(parts)
+
+    def close(self):
+        """Stop the worker thread after the requests already queued; a later encode() starts a new one."""
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put((self._STOP, next(self._seq), None, None))
+
+    def stats(self):
+        """Batches and texts encoded, plus histograms (power-of-two buckets) of texts per
+           model call and of requests still queued when each batch was flushed."""
+        with self._lock:
+            return {"batches": self._batches, "texts": self._texts,
+                    "max_batch": self.max_batch, "max_wait": self.max_wait,
+                    "batch_size_hist": dict(sorted(self._batch_sizes.items())),
+                    "queue_depth_hist": dict(sorted(self._queue_depths.items()))}
+
+    def _ensure_worker(self):
+        # under the lock: a worker leaving on close() either sees this request queued or
+        # has already cleared _thread
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="complimate-lite-encoder", daemon=True)
+                self._thread.start()
+
+    def _next_batch(self):
+        batch = [self._queue.get()]
+        if batch[0][2] is None:
+            return None, 0
+        size = len(batch[0][2])
+        deadline = time.monotonic() + self.max_wait
+        while size < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item[2] is None or size + len(item[2]) > self.max_batch:
+                self._queue.put(item)  # keeps its place; starts the next batch
+                break
+            batch.append(item)
+            size += len(item[2])
+        return batch, size
+
+    def _record(self, size, depth):
+        with self._lock:
+            self._batches += 1
+            self._texts += size
+            bucket = 1 << max(size - 1, 0).bit_length()
+            self._batch_sizes[bucket] = self._batch_sizes.get(bucket, 0) + 1
+            bucket = 1 << max(depth - 1, 0).bit_length() if depth else 0
+            self._queue_depths[bucket] = self._queue_depths.get(bucket, 0) + 1
+
+    def _run(self):
+        while True:
+            batch, size = self._next_batch()
+            if batch is None:
+                with self._lock:
+                    if self._queue.empty():
+                        self._thread = None
+                        return
+                continue
+            self._record(size, self._queue.qsize())
+            try:
+                encode = self._encode()
+                if encode is None:
+                    raise RuntimeError("encoder owner was garbage-collected")
+                vecs = encode([t for _, _, texts, _ in batch for t in texts])
+            except Exception as e:
+                for *_, future in batch:
+                    future.set_exception(e)
+                continue
+            finally:
+                encode = None  # no strong reference to the owner between batches
+            start = 0
+            for _, _, texts, future in batch:
+                future.set_result(vecs[start:start + len(texts)])
+                start += len(texts)
+
+
+# ------------------------
+# Instrumentation
+# ------------------------
+
+class _StageMetrics:
+    """Per-stage call counts, seconds and item totals for ingestion and queries, plus
+       plain counters. A timed stage costs two perf_counter calls and a lock, so the
+       metrics stay on in production."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._stages = {}    # (phase, stage) -> [calls, seconds, max seconds, items]
+        self._counters = {}  # (phase, name) -> count
+
+    @contextmanager
+    def time(self, phase, stage, items=0):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, stage, time.perf_counter() - start, items)
+
+    def record(self, phase, stage, seconds, items=0):
+        with self._lock:
+            totals = self._stages.get((phase, stage))
+            if totals is None:
+                totals = self._stages[(phase, stage)] = [0, 0.0, 0.0, 0]
+            totals[0] += 1
+            totals[1] += seconds
+            totals[2] = max(totals[2], seconds)
+            totals[3] += items
+
+    def count(self, phase, name, n=1):
+        with self._lock:
+            self._counters[(phase, name)] = self._counters.get((phase, name), 0) + n
+
+    def snapshot(self):
+        with self._lock:
+            out = {}
+            for (phase, stage), (calls, seconds, max_seconds, items) in sorted(self._stages.items()):
+                out.setdefault(phase, {"stages": {}, "counters": {}})["stages"][stage] = {
+                    "calls": calls, "seconds": seconds, "max_seconds": max_seconds, "items": items}
+            for (phase, name), n in sorted(self._counters.items()):
+                out.setdefault(phase, {"stages": {}, "counters": {}})["counters"][name] = n
+            return out
+
+    def prometheus(self, prefix="complimate_lite"):
+        lines = []
+        with self._lock:
+            stages = sorted(self._stages.items())
+            counters = sorted(self._counters.items())
+        for suffix, column, kind, help_text in (
+                ("stage_calls_total", 0, "counter", "Times the stage ran"),
+                ("stage_seconds_total", 1, "counter", "Wall-clock seconds spent in the stage"),
+                ("stage_seconds_max", 2, "gauge", "Longest single run of the stage"),
+                ("stage_items_total", 3, "counter", "Files, sections, texts or vectors the stage handled")):
+            lines.append(f"# HELP {prefix}_{suffix} {help_text}.")
+            lines.append(f"# TYPE {prefix}_{suffix} {kind}")
+            for (phase, stage), totals in stages:
+                lines.append(f'{prefix}_{suffix}{{phase="{phase}",stage="{stage}"}} {totals[column]}')
+        lines.append(f"# HELP {prefix}_events_total Counted events.")
+        lines.append(f"# TYPE {prefix}_events_total counter")
+        for (phase, name), n in counters:
+            lines.append(f'{prefix}_events_total{{phase="{phase}",name="{name}"}} {n}')
+        return "\n".join(lines) + "\n"
+
+
 # ------------------------
 # Role-Keyword Mapping
 # ------------------------
@@ -52,10 +766,283 @@ shared_items = [
     "Storage Regulations", "Licensing of Petroleum Activities", "Power to Make Rules", "Delegation of Powers"
 ]
 
+# membership sets mirroring the lists above; the lists keep insertion order and are what gets persisted
+_ROLE_KEYWORD_SETS = {role: set(kws) for role, kws in ROLE_FILE_MAP.items()}
+_SHARED_ITEM_SET = set(shared_items)
+
+
+def _add_role_keyword(role, keyword):
+    """Append keyword to ROLE_FILE_MAP[role] unless present; True if it was added."""
+    known = _ROLE_KEYWORD_SETS.get(role)
+    if known is None:
+        known = _ROLE_KEYWORD_SETS[role] = set(ROLE_FILE_MAP.setdefault(role, []))
+    if keyword in known:
+        return False
+    known.add(keyword)
+    ROLE_FILE_MAP[role].append(keyword)
+    return True
+
+
+def _add_shared_item(item):
+    """Record item as shared (visible to every role); True if it was new."""
+    if item in _SHARED_ITEM_SET:
+        return False
+    _SHARED_ITEM_SET.add(item)
+    shared_items.append(item)
+    for role in ROLE_FILE_MAP:
+        _add_role_keyword(role, item)
+    return True
+
+
 for item in shared_items:
     for role in ROLE_FILE_MAP:
-        if item not in ROLE_FILE_MAP[role]:
-            ROLE_FILE_MAP[role].append(item)
+        _add_role_keyword(role, item)
+
+# guards ROLE_FILE_MAP / shared_items and their files; ingestion in any instance may extend them
+_ROLES_LOCK = threading.RLock()
+
+
+class _KeywordIndex:
+    """Token postings over the unique keywords of ROLE_FILE_MAP for batched Jaccard
+       scoring of headings (see CompliMateLite._infer_access_tags).
+       Each keyword keeps the rank of the first role (in map order) listing it, which is
+       the role the original nested loop picked when that keyword scored highest. The
+       role lists only grow, so sync() appends the keywords added since the last call.
+       Only similarities >= min_sim matter to the caller, so candidates are found by
+       prefix filtering: under one global token order, a heading and a keyword with
+       Jaccard >= min_sim share a token within both prefixes. The order puts rare tokens
+       first; it is recomputed (and the postings rebuilt) whenever the keyword count
+       doubles, and tokens first seen in between go before all others."""
+
+    BLOCK = 1024      # headings scored per batch of candidate pairs
+    MIN_REORDER = 64  # keywords before the token order is first recomputed
+
+    def __init__(self, role_map=None, min_sim=KEYWORD_SIM_THRESHOLD):
+        self.min_sim = min_sim
+        self.roles = []
+        self.signature = None
+        self._seen = {}      # role -> keywords of its list already indexed
+        self._kw_ids = {}    # keyword -> index
+        self._vocab = {}     # token -> id
+        self._priority = []  # token id -> place in the global order, higher first
+        self._df = []        # token id -> keywords containing it
+        self._ranks = []     # keyword index -> rank of the first role listing it
+        self._tokens = []    # keyword index -> token ids
+        self._postings = {}  # token id -> keywords with the token in their prefix, ascending
+        self._arrays = {}    # token id -> postings as an array, until the token gains a keyword
+        self._columns = None  # (ranks, sizes, token offsets, token ids) arrays of the first keywords
+        self._ordered_at = 0  # keywords when the order was last recomputed
+        if role_map is not None:
+            self.sync(role_map)
+
+    def _prefix(self, size):
+        # tokens of a set of this size that must include a shared one when Jaccard >= min_sim
+        return size - max(1, math.ceil(self.min_sim * size - 1e-9)) + 1
+
+    def sync(self, role_map):
+        # index keywords appended to the role lists since the last sync
+        for role, keywords in role_map.items():
+            if role not in self._seen:
+                self.roles.append(role)
+                self._seen[role] = 0
+            r = self.roles.index(role)
+            for kw in keywords[self._seen[role]:]:
+                k = self._kw_ids.get(kw)
+                if k is None:
+                    k = self._kw_ids[kw] = len(self._ranks)
+                    tokens = [self._token_id(t) for t in set(kw.lower().split())]
+                    for t in tokens:
+                        self._df[t] += 1
+                    self._ranks.append(r)
+                    self._tokens.append(tokens)
+                    self._post(k)
+                elif r < self._ranks[k]:
+                    self._ranks[k] = r
+                    if self._columns is not None and k < len(self._columns[0]):
+                        self._columns[0][k] = r
+            self._seen[role] = len(keywords)
+        if len(self._ranks) >= max(self.MIN_REORDER, 2 * self._ordered_at):
+            self._reorder()
+        self.signature = _roles_signature()
+
+    def _token_id(self, token):
+        t = self._vocab.get(token)
+        if t is None:
+            t = self._vocab[token] = len(self._priority)
+            self._priority.append(len(self._priority))  # newest token goes first
+            self._df.append(0)
+        return t
+
+    def _ordered(self, ids):
+        return sorted(ids, key=self._priority.__getitem__, reverse=True)
+
+    def _post(self, k):
+        tokens = self._ordered(self._tokens[k])
+        for t in tokens[:self._prefix(len(tokens))]:
+            self._postings.setdefault(t, []).append(k)
+            self._arrays.pop(t, None)
+
+    def _reorder(self):
+        # rarest token first; later tokens keep getting priorities above all of these
+        for place, t in enumerate(sorted(range(len(self._df)), key=lambda t: (-self._df[t], t))):
+            self._priority[t] = place
+        self._postings, self._arrays = {}, {}
+        for k in range(len(self._tokens)):
+            self._post(k)
+        self._ordered_at = len(self._ranks)
+
+    def _posting(self, token):
+        arr = self._arrays.get(token)
+        if arr is None:
+            kws = self._postings.get(token)
+            if kws is None:
+                return None
+            arr = self._arrays[token] = np.array(kws, dtype="int64")
+        return arr
+
+    def _extend_columns(self):
+        # append the keywords indexed since the last call to the array columns
+        done = 0 if self._columns is None else len(self._columns[0])
+        if self._columns is not None and done == len(self._ranks):
+            return
+        new = self._tokens[done:]
+        sizes = np.array([len(t) for t in new], dtype="int64")
+        tokens = np.array([t for kw_tokens in new for t in kw_tokens], dtype="int64")
+        if self._columns is None:
+            self._columns = (np.array(self._ranks, dtype="int64"), sizes,
+                             np.concatenate([[0], np.cumsum(sizes)]).astype("int64"), tokens)
+            return
+        ranks, old_sizes, ptr, old_tokens = self._columns
+        self._columns = (np.concatenate([ranks, np.array(self._ranks[done:], dtype="int64")]),
+                         np.concatenate([old_sizes, sizes]),
+                         np.concatenate([ptr, ptr[-1] + np.cumsum(sizes)]),
+                         np.concatenate([old_tokens, tokens]))
+
+    def best(self, token_sets):
+        """(best similarity, rank of the winning role) per token set; similarities below
+           min_sim are reported as 0 with rank -1."""
+        best = np.zeros(len(token_sets))
+        winner = np.full(len(token_sets), -1, dtype="int64")
+        if not self._ranks:
+            return best, winner
+        self._extend_columns()
+        ranks, sizes, tok_ptr, tok_ids = self._columns
+        n_kw, n_tok = len(ranks), len(self._vocab)
+        for lo in range(0, len(token_sets), self.BLOCK):
+            block = token_sets[lo:lo + self.BLOCK]
+            heads, kws, known = [], [], []
+            h_sizes = np.array([len(tokens) for tokens in block], dtype="int64")
+            for i, tokens in enumerate(block):
+                ids = self._ordered([self._vocab[t] for t in tokens if t in self._vocab])
+                known.extend(i * n_tok + t for t in ids)
+                # unknown tokens come first in the order and match no keyword
+                probe = self._prefix(len(tokens)) - (len(tokens) - len(ids))
+                for t in ids[:max(probe, 0)]:
+                    post = self._posting(t)
+                    if post is not None:
+                        heads.append(np.full(len(post), i, dtype="int64"))
+                        kws.append(post)
+            if not kws:
+                continue
+            pairs = np.sort(np.concatenate(heads) * n_kw + np.concatenate(kws))
+            pairs = pairs[np.concatenate([[True], pairs[1:] != pairs[:-1]])]
+            head, kw = np.divmod(pairs, n_kw)
+            fits = (sizes[kw] >= self.min_sim * h_sizes[head] - 1e-9) & (self.min_sim * sizes[kw] <= h_sizes[head] + 1e-9)
+            head, kw = head[fits], kw[fits]
+            if not len(kw):
+                continue
+
+            # exact intersections: look every token of each candidate keyword up in its heading
+            counts = sizes[kw]
+            starts = np.repeat(tok_ptr[kw] - np.cumsum(counts) + counts, counts)
+            toks = tok_ids[starts + np.arange(counts.sum())]
+            probes = np.repeat(head, counts) * n_tok + toks
+            known = np.array(sorted(known), dtype="int64")
+            slots = np.minimum(np.searchsorted(known, probes), len(known) - 1)
+            inter = np.bincount(np.repeat(np.arange(len(kw)), counts), weights=known[slots] == probes,
+                                minlength=len(kw))
+            sims = inter / (h_sizes[head] + counts - inter)
+            keep = sims >= self.min_sim
+            head, kw, sims = head[keep], kw[keep], sims[keep]
+
+            top = np.zeros(len(block))
+            np.maximum.at(top, head, sims)
+            tied = sims == top[head]
+            first = np.full(len(block), len(self.roles), dtype="int64")
+            np.minimum.at(first, head[tied], ranks[kw[tied]])
+            best[lo:lo + len(block)] = top
+            winner[lo:lo + len(block)] = np.where(top > 0, first, -1)
+        return best, winner
+
+
+_keyword_index = None  # extended when the role maps grow
+
+
+def _roles_signature():
+    # ROLE_FILE_MAP / shared_items only ever grow, so their sizes identify a version
+    return len(shared_items), tuple((role, len(kws)) for role, kws in ROLE_FILE_MAP.items())
+
+
+# ------------------------
+# Process-wide sharing
+# ------------------------
+
+class _SharedRegistry:
+    """Reference-counted models and stores shared by every CompliMateLite in the process.
+       Models are loaded and stores built outside the lock: the first caller for a key
+       leaves a Future in its slot, and later callers for that key wait on it alone."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.models = {}  # model name -> [Future of the model, refs]
+        self.stores = {}  # (rag folder, meta folder) -> [Future of the instance, refs]
+
+    def _acquire(self, table, key, create):
+        with self.lock:
+            slot = table.get(key)
+            owner = slot is None
+            if owner:
+                slot = table[key] = [Future(), 0]
+            slot[1] += 1
+        if owner:
+            try:
+                slot[0].set_result(create())
+            except BaseException as e:
+                # waiters see the error; the next caller for the key tries again
+                with self.lock:
+                    if table.get(key) is slot:
+                        del table[key]
+                slot[0].set_exception(e)
+                raise
+        return slot[0].result()
+
+    def acquire_model(self, name, load):
+        return self._acquire(self.models, name, lambda: load(name))
+
+    def release_model(self, name):
+        with self.lock:
+            slot = self.models.get(name)
+            if slot is not None:
+                slot[1] -= 1
+                if slot[1] <= 0:
+                    del self.models[name]
+
+    def acquire_store(self, key, create):
+        return self._acquire(self.stores, key, create)
+
+    def release_store(self, key):
+        with self.lock:
+            slot = self.stores.get(key)
+            if slot is None:
+                return False
+            slot[1] -= 1
+            if slot[1] <= 0:
+                del self.stores[key]
+                return True
+            return False
+
+
+_REGISTRY = _SharedRegistry()
 
 
 # ------------------------
@@ -65,18 +1052,36 @@ for item in shared_items:
 class CompliMateLite:
     def __init__(self,
                  rag_folder_lite=None,   # Path to RAG docs folder
-                 meta_folder_lite=None): # Path to META folder
+                 meta_folder_lite=None,  # Path to META folder
+                 ingest_workers=None,    # Processes for hashing/conversion/parsing (None -> all cores)
+                 encode_batch_size=4096, # Paragraphs buffered per embedding batch
+                 progress=None,          # Optional callback(stage, *info) for ingestion progress
+                 index_backend=None,     # One of INDEX_BACKENDS (None -> as persisted, else "flat")
+                 index_params=None,      # Overrides for DEFAULT_INDEX_PARAMS
+                 lazy=False,             # Return at once: mmap stored indexes, load the model on first use,
+                                         # build / update in a background thread (see status())
+                 query_cache_size=512,   # Cached search results (prompt, role, top_k); 0 disables
+                 query_cache_ttl=None,   # Seconds a cached result stays valid (None -> until the index changes)
+                 prompt_cache_size=1024,  # Cached prompt embeddings; 0 disables
+                 encode_max_batch=64,    # Texts per model call in the embedding scheduler
+                 encode_max_wait=0.002, # Seconds a scheduler batch waits for more requests
+                 checkpoint_every=None,  # Persist the store every N newly embedded paragraphs while ingesting,
+                                         # so an interrupted run resumes there (None -> only at the end).
+                                         # Each checkpoint rewrites the whole store (meta, paragraphs, both
+                                         # FAISS files), so a build of P paragraphs writes ~P*P/(2N) of them
+                                         # in total: keep N a sizeable share of the corpus
+                 hybrid=True):           # Fuse BM25 paragraph matches with the dense search (False -> dense only)
         
-        base_dir = os.path.dirname(__file__)  # Where this file is located
-
-        # Default to folders inside repo if not provided
-        if rag_folder_lite is None:
-            rag_folder_lite = os.path.join(base_dir, "RAG_folder_lite") #your rag folder path
-        if meta_folder_lite is None:
-            meta_folder_lite = os.path.join(base_dir, "meta_folder_lite") #your meta folder path
+        rag_folder_lite, meta_folder_lite = self._resolve_folders(rag_folder_lite, meta_folder_lite)
 
         self.rag_folder_lite = rag_folder_lite
         self.meta_folder_lite = meta_folder_lite
+        self.ingest_workers = ingest_workers
+        self.encode_batch_size = encode_batch_size
+        self.progress = progress
+        self.lazy = lazy
+        self.checkpoint_every = checkpoint_every
+        self.hybrid = hybrid
         os.makedirs(self.meta_folder_lite, exist_ok=True)
 
         # File paths inside META folder
@@ -84,22 +1089,86 @@ class CompliMateLite:
         self.processed_file = os.path.join(self.meta_folder_lite, "processed_lite.json")
         self.index_file = os.path.join(self.meta_folder_lite, "section_index_lite.faiss")
         self.paragraph_index_file = os.path.join(self.meta_folder_lite, "paragraph_index_lite.faiss")
-        self.paragraphs_file = os.path.join(self.meta_folder_lite, "paragraphs_lite.pkl")
+        self.paragraphs_file = os.path.join(self.meta_folder_lite, "paragraphs_lite.pkl")  # legacy format
+        self.paragraph_store_prefix = os.path.join(self.meta_folder_lite, "paragraphs_lite")
+        self.lexical_index_prefix = os.path.join(self.meta_folder_lite, "lexical_index_lite")
+        self.id_ranges_file = os.path.join(self.meta_folder_lite, "id_ranges_lite.json")
+        self.embedding_cache_file = os.path.join(self.meta_folder_lite, "embedding_cache_lite.f32")
+        self.embedding_offsets_file = os.path.join(self.meta_folder_lite, "embedding_cache_lite.json")
+        self.embedding_keys_file = os.path.join(self.meta_folder_lite, "embedding_cache_lite.keys")
+        self.embedding_lock_file = os.path.join(self.meta_folder_lite, "embedding_cache_lite.lock")
+        self.index_config_file = os.path.join(self.meta_folder_lite, "index_config_lite.json")
 
         # Persistence for learned roles/shared headings
         self.roles_file = os.path.join(self.meta_folder_lite, "roles_map.json")
         self.shared_file = os.path.join(self.meta_folder_lite, "shared_items.json")
 
-        # Model setup
-        self.model = SentenceTransformer("multi-qa-MiniLM-L6-cos-v1")
-        dim = self.model.get_sentence_embedding_dimension()
+        # Index backend: explicit choice, else the one the store was built with
+        persisted_config = {"backend": "flat", "params": {}}  # stores from before backends were configurable
+        if os.path.exists(self.index_config_file):
+            try:
+                with open(self.index_config_file, "r", encoding="utf-8") as f:
+                    persisted_config = json.load(f)
+            except Exception as e:
+                print(f"[WARN] Could not load index config: {e}")
+        self.index_backend = index_backend or persisted_config.get("backend", "flat")
+        if self.index_backend not in INDEX_BACKENDS:
+            raise ValueError(f"Unknown index backend {self.index_backend!r}, expected one of {INDEX_BACKENDS}")
+        self.index_params = dict(DEFAULT_INDEX_PARAMS)
+        if self.index_backend == persisted_config.get("backend"):
+            self.index_params.update(persisted_config.get("params", {}))
+        self.index_params.update(index_params or {})
+        if self.index_params["storage"] not in INDEX_STORAGE:
+            raise ValueError(f"Unknown index storage {self.index_params['storage']!r}, expected one of {INDEX_STORAGE}")
+
+        # Readiness: set once queries can be answered
+        self._ready = threading.Event()
+        self._status = {"state": "loading", "stage": None, "info": (), "error": None}
+        self._state_lock = _ReadWriteLock()  # read: queries, write: swapping in a rebuilt store
+        self._worker = None
+        self._sync_lock = threading.Lock()  # one ingestion run at a time (build, refresh, update_index)
+        self._encoder = _EncodeBatcher(self._encode_batch, encode_max_batch, encode_max_wait)
+        weakref.finalize(self, self._encoder.close)
+        self._metrics = _StageMetrics()  # per-stage timings, see stage_stats()
+
+        # Query caches; the generation changes whenever the indexed store does
+        self._result_cache = _LRUCache(query_cache_size, query_cache_ttl)
+        self._prompt_vec_cache = _LRUCache(prompt_cache_size)
+        self._generation = 0
+        self._role_filters = {}  # role -> (generation, roles signature, _RoleFilter)
+        self._section_table = None  # (generation, paragraph order, section keys, starts)
+
+        # Model setup (shared process-wide, loaded on first use in lazy mode)
+        self.model_name = "multi-qa-MiniLM-L6-cos-v1"
+        self._model = None
+        self._model_lock = threading.Lock()
+        self._model_release = None
+        self._shared_key = None  # set for instances handed out by shared()
+        self._dim = None
+        if not lazy:
+            self._dim = self.model.get_sentence_embedding_dimension()
         self.index = None
         self.paragraph_index = None
+        self._indexes_readonly = False  # mmapped / shared indexes are re-read from disk before writing
+        self._roles_dirty = False  # headings learned into ROLE_FILE_MAP / shared_items, not yet written
 
         # In-memory stores
         self.meta = []
-        self.paragraphs = []
-        self.processed = {}
+        self.paragraphs = ParagraphStore()
+        self._lexical = LexicalIndex()  # BM25 postings over self.paragraphs
+        self._lexical_store = self.paragraphs  # the store self._lexical was built or checked for
+        self.processed = {}   # source key -> {"size", "mtime_ns", "hash", "algo", "checked_ns"}
+        self.id_ranges = {}   # source key -> {"sections": [start, end], "paragraphs": [start, end]}
+        self.last_scan = None  # added/changed/removed/touched report of the last update_index
+        self._meta_pos = {}   # section vector id -> position in self.meta
+        self._emb_rows = 0       # rows in the embedding cache
+        self._emb_index = None   # _DigestIndex over the cache's text digests, loaded on first lookup
+        self._emb_matrix = None
+        self._auth = None  # _AuthIndex, rebuilt when meta or the role maps change
+        self._heading_keys = None  # unique lowercase headings, sorted by length
+
+        # Reuse embeddings of texts seen in earlier runs
+        self._load_embedding_cache()
 
         # Load processed map early if present
         if os.path.exists(self.processed_file):
@@ -114,41 +1183,289 @@ class CompliMateLite:
 
         # If all index/meta files exist → load, else build fresh
         required = [self.meta_file, self.processed_file,
-                    self.index_file, self.paragraph_index_file, self.paragraphs_file]
-        if all(os.path.exists(p) for p in required):
+                    self.index_file, self.paragraph_index_file]
+        has_paragraphs = (all(os.path.exists(p) for p in ParagraphStore.paths(self.paragraph_store_prefix))
+                          or os.path.exists(self.paragraphs_file))
+        if all(os.path.exists(p) for p in required) and has_paragraphs:
             self._load_all()
-            print("Meta entries:", len(self.meta))
-            print("Section index size:", self.index.ntotal)
-            print("Paragraphs entries:", len(self.paragraphs))
-            print("Paragraph index size:", self.paragraph_index.ntotal)
+            if lazy:
+                # serve the stored indexes right away, sync with the RAG folder behind them
+                self._set_ready()
+                self._start_worker(self._sync_in_background, persisted_config)
+            else:
+                self._sync_store(persisted_config)
+                self._set_ready()
+        elif lazy:
+            self._start_worker(self._build_in_background)
         else:
-            self.index = faiss.IndexFlatL2(dim)
-            self.paragraph_index = faiss.IndexFlatL2(dim)
             self._build_index()
+            self._set_ready()
 
+    @staticmethod
+    def _resolve_folders(rag_folder_lite, meta_folder_lite):
+        base_dir = os.path.dirname(__file__)  # Where this file is located
 
-    def _get_file_hash(self, filepath):
-        hasher = hashlib.md5()
-        with open(filepath, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b""):
-                hasher.update(chunk)
+        # Default to folders inside repo if not provided
+        if rag_folder_lite is None:
+            rag_folder_lite = os.path.join(base_dir, "RAG_folder_lite") #your rag folder path
+        if meta_folder_lite is None:
+            meta_folder_lite = os.path.join(base_dir, "meta_folder_lite") #your meta folder path
+        return rag_folder_lite, meta_folder_lite
+
+    @classmethod
+    def shared(cls, rag_folder_lite=None, meta_folder_lite=None, **kwargs):
+        """Process-wide instance for a RAG/META folder pair, created on first call.
+           Every caller (e.g. each Streamlit session) gets the same model, indexes and
+           stores; refresh() swaps a rebuilt store in for all of them at once. Pair each
+           call with release(). kwargs only apply when the instance is created."""
+        rag_folder_lite, meta_folder_lite = cls._resolve_folders(rag_folder_lite, meta_folder_lite)
+        key = (os.path.realpath(rag_folder_lite), os.path.realpath(meta_folder_lite))
+
+        def create():
+            instance = cls(rag_folder_lite, meta_folder_lite, **kwargs)
+            instance._shared_key = key
+            return instance
+
+        return _REGISTRY.acquire_store(key, create)
+
+    def release(self):
+        """Drop one reference taken by shared(); the last one also releases the model."""
+        if self._shared_key is None or _REGISTRY.release_store(self._shared_key):
+            self.close()
+
+    def close(self):
+        """Release this instance's reference on the shared model and stop its encoder thread."""
+        self._encoder.close()
+        with self._model_lock:
+            if self._model_release is not None:
+                self._model_release()
+                self._model_release = None
+            self._model = None
+
+    @property
+    def model(self):
+        # one model per name in the process; loaded on first access (at construction unless lazy)
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    self._set_status(stage="loading model")
+                    self._model = _REGISTRY.acquire_model(self.model_name, SentenceTransformer)
+                    self._model_release = weakref.finalize(self, _REGISTRY.release_model, self.model_name)
+        return self._model
+
+    def _embedding_dim(self):
+        # known from the stored index / embedding cache, so a lazy instance need not load the model
+        if self._dim is None:
+            self._dim = self.model.get_sentence_embedding_dimension()
+        return self._dim
+
+    def _sync_store(self, persisted_config):
+        # bring a loaded store in line with the index config and the RAG folder
+        if self._build_config(self._index_config()) != self._build_config(persisted_config):
+            print(f"[INFO] Index backend changed to {self.index_backend}, re-indexing stored vectors.")
+            self.index = self._reembed_sections()
+            self.paragraph_index = self._reembed_paragraphs()
+            self._indexes_readonly = False
+            self._invalidate_results()
+            self._persist_all()
+        elif self._index_config() != persisted_config:
+            # search-time params only: remember them for the next start
+            try:
+                self._atomic_write_json(self.index_config_file, self._index_config())
+            except Exception as e:
+                print(f"[WARN] Failed to write index config: {e}")
+        # pick up added / changed / removed files without re-embedding the rest
+        self._update_store()
+        print("Meta entries:", len(self.meta))
+        print("Section index size:", self.index.ntotal)
+        print("Paragraphs entries:", len(self.paragraphs))
+        print("Paragraph index size:", self.paragraph_index.ntotal)
+
+    # ------------------------
+    # Background startup / readiness
+    # ------------------------
+    def is_ready(self):
+        """True once queries can be answered (always True for a non-lazy instance)."""
+        return self._ready.is_set()
+
+    def wait_until_ready(self, timeout=None):
+        """Block until the instance is ready or timeout seconds pass; returns is_ready()."""
+        return self._ready.wait(timeout)
+
+    def status(self):
+        """Startup progress: {"ready", "state", "stage", "info", "error"}.
+           state is "loading", "building", "updating", "ready" or "failed"; stage/info
+           echo the last progress report (e.g. "parsed", "embedded")."""
+        return dict(self._status, ready=self.is_ready())
+
+    def _set_status(self, **fields):
+        self._status = dict(self._status, **fields)
+
+    def _set_ready(self):
+        self._set_status(state="ready", error=None)
+        self._ready.set()
+
+    def refresh(self):
+        """Re-sync with the RAG folder on a background thread, serving the current store
+           meanwhile, and swap the result in for every user of this instance when done.
+           Returns the worker thread (an already running refresh is reused)."""
+        if self._worker is not None and self._worker.is_alive():
+            return self._worker
+        return self._start_worker(self._sync_in_background, self._index_config())
+
+    def _start_worker(self, target, *args):
+        def run():
+            try:
+                target(*args)
+            except Exception as e:
+                print(f"[ERROR] Background indexing failed: {e}")
+                self._set_status(state="failed", error=str(e))
+                self._ready.set()  # unblock waiting queries; they see whatever store is loaded
+
+        self._worker = threading.Thread(target=run, name="complimate-lite-indexer", daemon=True)
+        self._worker.start()
+        return self._worker
+
+    def _build_in_background(self):
+        # nothing is served yet, so the build can run on this instance directly
+        self._set_status(state="building")
+        with self._sync_lock:
+            self._build_index()
+        self._set_ready()
+
+    def _sync_in_background(self, persisted_config):
+        # update a copy while this instance keeps serving, then swap it in
+        self._set_status(state="updating")
+        with self._sync_lock:
+            shadow = self._shadow()
+            shadow._sync_store(persisted_config)
+            self._adopt_update(shadow)
+        self._set_ready()
+
+    def _adopt_update(self, shadow):
+        if self.lazy and (shadow.index is not self.index or shadow.paragraph_index is not self.paragraph_index):
+            # serve the persisted result mmapped rather than the in-memory build copies
+            shadow._load_indexes()
+        self._adopt(shadow)
+
+    _STATE_FIELDS = ("meta", "paragraphs", "_lexical", "_lexical_store", "processed", "id_ranges", "last_scan", "index", "paragraph_index",
+                     "_indexes_readonly", "_dim", "_meta_pos", "_auth",
+                     "_heading_keys", "_heading_entries", "_heading_lens",
+                     "_heading_counts", "_heading_blob", "_heading_starts", "_emb_rows", "_emb_index", "_emb_matrix")
+
+    def _shadow(self):
+        # copy whose updates do not touch the state this instance is serving
+        shadow = copy.copy(self)
+        shadow.meta = list(self.meta)
+        shadow.processed = dict(self.processed)
+        shadow.id_ranges = copy.deepcopy(self.id_ranges)
+        shadow._emb_index = self._emb_index.copy() if self._emb_index is not None else None
+        shadow._indexes_readonly = True
+        shadow._model_release = None  # the model reference stays with this instance
+        shadow._role_filters = {}
+        shadow._section_table = None
+        shadow.progress = lambda stage, *info: self._report_progress(stage, *info)
+        return shadow
+
+    def _adopt(self, other):
+        with self._state_lock.write():
+            for field in self._STATE_FIELDS:
+                if hasattr(other, field):
+                    setattr(self, field, getattr(other, field))
+            self._invalidate_results()
+
+
+    def _get_file_hash(self, filepath, algo=FILE_DIGEST):
+        hasher = hashlib.new(algo)
+        buf = bytearray(HASH_BUFFER_SIZE)
+        view = memoryview(buf)
+        with open(filepath, 'rb', buffering=0) as f:
+            for n in iter(lambda: f.readinto(buf), 0):
+                hasher.update(view[:n])
         return hasher.hexdigest()
 
+    def _stat_unchanged(self, filepath, record):
+        # size and mtime as when the content was last hashed, and that hash was taken long
+        # enough after the last write that a same-tick rewrite cannot hide behind the mtime
+        if not isinstance(record, dict):
+            return False
+        try:
+            st = os.stat(filepath)
+        except OSError:
+            return False
+        return (st.st_size == record.get("size") and st.st_mtime_ns == record.get("mtime_ns")
+                and st.st_mtime_ns < record.get("checked_ns", 0) - RACY_MTIME_NS)
+
+    def _file_record(self, filepath, known=None):
+        """Hash filepath; returns (content changed, its processed_lite.json record).
+           known is the previous record, or a bare MD5 string as stored before records
+           carried stat signatures; it is compared under the digest it was taken with."""
+        st = os.stat(filepath)  # before reading, so a write during hashing moves the mtime
+        checked = time.time_ns()
+        if isinstance(known, dict):
+            algo, old = known.get("algo", FILE_DIGEST), known.get("hash")
+        else:
+            algo, old = ("md5", known) if known else (FILE_DIGEST, None)
+        digest = self._get_file_hash(filepath, algo)
+        changed = digest != old
+        if changed and algo != FILE_DIGEST:
+            algo, digest = FILE_DIGEST, self._get_file_hash(filepath)
+        return changed, _stat_record(st, digest, algo, checked)
+
+    def _source_files(self):
+        # (key, fullpath) of the .pdf/.docx files in the RAG folder
+        sources = []
+        for filename in os.listdir(self.rag_folder_lite):
+            lower = filename.lower()
+            if lower.endswith(".pdf") or lower.endswith(".docx"):
+                fullpath = os.path.join(self.rag_folder_lite, filename)
+                sources.append((os.path.relpath(fullpath, self.rag_folder_lite), fullpath))
+        return sources
+
+    def _removed_sources(self, sources):
+        present = {key for key, _ in sources}
+        return sorted(key for key in set(self.processed) | set(self.id_ranges)
+                      if key not in ("roles_file", "shared_file") and key not in present)
+
+    def scan_changes(self):
+        """Compare the RAG folder with processed_lite.json without ingesting anything.
+           Returns {"added", "changed", "removed", "touched": [keys], "unchanged": count};
+           files whose size and mtime match their record are not read, "touched" ones
+           were re-hashed and found to have the same content."""
+        sources = self._source_files()
+        report = {"added": [], "changed": [], "removed": self._removed_sources(sources),
+                  "touched": [], "unchanged": 0}
+        for key, fullpath in sources:
+            known = self.processed.get(key)
+            if self._stat_unchanged(fullpath, known):
+                report["unchanged"] += 1
+                continue
+            try:
+                changed, _ = self._file_record(fullpath, known)
+            except OSError as e:
+                print(f"[ERROR] Failed hashing {fullpath}: {e}")
+                continue
+            report["added" if known is None else "changed" if changed else "touched"].append(key)
+        return report
+
     # ------------------------
     # Persistence helpers
     # ------------------------
     def _atomic_write_json(self, path, data):
+        # returns the FILE_DIGEST of the written file (what _get_file_hash would compute)
+        payload = json.dumps(data, indent=2, ensure_ascii=False).encode("utf-8")
         tmp = path + ".tmp"
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        with open(tmp, "wb") as f:
+            f.write(payload)
             f.flush()
             os.fsync(f.fileno())
         os.replace(tmp, path)
+        return hashlib.new(FILE_DIGEST, payload).hexdigest()
 
-    def _atomic_write_pickle(self, path, data):
+    def _atomic_write_npy(self, path, array):
         tmp = path + ".tmp"
         with open(tmp, "wb") as f:
-            pickle.dump(data, f)
+            np.save(f, np.ascontiguousarray(array))
             f.flush()
             os.fsync(f.fileno())
         os.replace(tmp, path)
@@ -162,57 +1479,56 @@ class CompliMateLite:
     # Roles / shared persistence
     # ------------------------
     def _load_persisted_roles(self):
+        with _ROLES_LOCK:
+            self._merge_persisted_roles()
+
+    def _merge_persisted_roles(self):
+        # files matching their processed_lite.json stat signature are neither hashed nor parsed
         try:
         # roles_map.json
-            if os.path.exists(self.roles_file):
-                file_hash = self._get_file_hash(self.roles_file)
-                if self.processed.get("roles_file") != file_hash:
+            known = self.processed.get("roles_file")
+            if os.path.exists(self.roles_file) and not self._stat_unchanged(self.roles_file, known):
+                changed, record = self._file_record(self.roles_file, known)
+                if changed:
                     with open(self.roles_file, "r", encoding="utf-8") as f:
                         persisted = json.load(f)
                     for role, kws in persisted.items():
-                        if role not in ROLE_FILE_MAP:
-                            ROLE_FILE_MAP[role] = []
                         for kw in kws:
-                            if kw not in ROLE_FILE_MAP[role]:
-                                ROLE_FILE_MAP[role].append(kw)
-                    self.processed["roles_file"] = file_hash
+                            _add_role_keyword(role, kw)
+                self.processed["roles_file"] = record
 
         # shared_items.json
-            if os.path.exists(self.shared_file):
-                file_hash = self._get_file_hash(self.shared_file)
-                if self.processed.get("shared_file") != file_hash:
+            known = self.processed.get("shared_file")
+            if os.path.exists(self.shared_file) and not self._stat_unchanged(self.shared_file, known):
+                changed, record = self._file_record(self.shared_file, known)
+                if changed:
                     with open(self.shared_file, "r", encoding="utf-8") as f:
                         persisted_shared = json.load(f)
                     for it in persisted_shared:
-                        if it not in shared_items:
-                            shared_items.append(it)
-                            for role in ROLE_FILE_MAP:
-                                if it not in ROLE_FILE_MAP[role]:
-                                    ROLE_FILE_MAP[role].append(it)
-                self.processed["shared_file"] = file_hash
+                        _add_shared_item(it)
+                self.processed["shared_file"] = record
         except Exception as e:
             print(f"[WARN] Failed to load persisted roles/shared: {e}")
 
     def _persist_roles_and_shared(self):
+        # headings learned during an ingestion run are written once, at its end;
+        # the caller persists processed_lite.json with the new file hashes
+        self._roles_dirty = False
         try:
         # persist ROLE_FILE_MAP (only lists)
-            self._atomic_write_json(self.roles_file, ROLE_FILE_MAP)
-            self.processed["roles_file"] = self._get_file_hash(self.roles_file)
+            with _ROLES_LOCK:
+                digest = self._atomic_write_json(self.roles_file, ROLE_FILE_MAP)
+                self.processed["roles_file"] = _stat_record(os.stat(self.roles_file), digest)
         except Exception as e:
             print(f"[WARN] Failed to persist ROLE_FILE_MAP: {e}")
 
         try:
-            self._atomic_write_json(self.shared_file, shared_items)
-            self.processed["shared_file"] = self._get_file_hash(self.shared_file)
+            with _ROLES_LOCK:
+                digest = self._atomic_write_json(self.shared_file, shared_items)
+                self.processed["shared_file"] = _stat_record(os.stat(self.shared_file), digest)
         except Exception as e:
             print(f"[WARN] Failed to persist shared_items: {e}")
 
-    # persist updated processed map
-        try:
-            self._atomic_write_json(self.processed_file, self.processed)
-        except Exception as e:
-            print(f"[WARN] Failed to persist updated processed file after roles/shared: {e}")
-
 
     # ------------------------
     # Loading & Building
@@ -221,25 +1537,47 @@ class CompliMateLite:
         # load meta and processed
         with open(self.meta_file, "r", encoding="utf-8") as f:
             self.meta = json.load(f)
+        for entry in self.meta:
+            entry["filename"] = sys.intern(entry["filename"])
+            entry["heading"] = sys.intern(entry["heading"])
         with open(self.processed_file, "r", encoding="utf-8") as f:
             self.processed = json.load(f)
 
-        # load paragraph metadata
-        with open(self.paragraphs_file, "rb") as f:
-            self.paragraphs = pickle.load(f)
+        # load paragraph store (memory-mapped); convert paragraphs_lite.pkl once if that is all there is
+        legacy = not all(os.path.exists(p) for p in ParagraphStore.paths(self.paragraph_store_prefix))
+        if legacy:
+            with open(self.paragraphs_file, "rb") as f:
+                self.paragraphs = self._convert_legacy_paragraphs(pickle.load(f))
+        else:
+            derive_keys = not os.path.exists(ParagraphStore.path(self.paragraph_store_prefix, "keys"))
+            self.paragraphs = ParagraphStore.load(self.paragraph_store_prefix)
+            if derive_keys:
+                try:
+                    self._atomic_write_npy(ParagraphStore.path(self.paragraph_store_prefix, "keys"), self.paragraphs.keys)
+                except Exception as e:
+                    print(f"[WARN] Could not persist paragraph cache keys: {e}")
+
+        # load per-file vector id ranges (derived for stores written before they existed)
+        self.id_ranges = {}
+        if os.path.exists(self.id_ranges_file):
+            try:
+                with open(self.id_ranges_file, "r", encoding="utf-8") as f:
+                    self.id_ranges = json.load(f)
+            except Exception as e:
+                print(f"[WARN] Could not load id ranges file: {e}")
+        self._refresh_positions()
+        if not self.id_ranges:
+            self._derive_id_ranges()
+        self._build_auth_index()
+        self._build_heading_index()
+        self._load_lexical_index()
 
         # load FAISS indexes (guard against corruption)
-        dim = self.model.get_sentence_embedding_dimension()
         try:
-            self.index = faiss.read_index(self.index_file)
+            self.index = self._read_index(self.index_file)
         except Exception as e:
             print(f"[WARN] Failed to load section index (will rebuild in-memory): {e}")
-            self.index = faiss.IndexFlatL2(dim)
-            if self.meta:
-                sections = [entry['content'] for entry in self.meta]
-                if sections:
-                    vecs = self.model.encode(sections, convert_to_numpy=True).astype("float32")
-                    self.index.add(vecs)
+            self.index = self._reembed_sections()
             # persist repaired index
             try:
                 self._atomic_write_faiss(self.index, self.index_file)
@@ -247,72 +1585,234 @@ class CompliMateLite:
                 print(f"[WARN] Could not persist repaired section index: {e2}")
 
         try:
-            self.paragraph_index = faiss.read_index(self.paragraph_index_file)
+            self.paragraph_index = self._read_index(self.paragraph_index_file)
         except Exception as e:
             print(f"[WARN] Failed to load paragraph index (will rebuild in-memory): {e}")
-            self.paragraph_index = faiss.IndexFlatL2(dim)
-            if self.paragraphs:
-                para_texts = [p['paragraph'] for p in self.paragraphs]
-                if para_texts:
-                    vecs = self.model.encode(para_texts, convert_to_numpy=True).astype("float32")
-                    self.paragraph_index.add(vecs)
+            self.paragraph_index = self._reembed_paragraphs()
             try:
                 self._atomic_write_faiss(self.paragraph_index, self.paragraph_index_file)
             except Exception as e2:
                 print(f"[WARN] Could not persist repaired paragraph index: {e2}")
-            
-            
+        self._indexes_readonly = self.lazy
+        if self._dim is None:
+            self._dim = self.index.d
+
+        if legacy:
+            self._persist_all()
 
+    def _lexical_current(self):
+        # whether self._lexical indexes self.paragraphs: they are set together, and any
+        # other change to the store replaces the store object, so identity is enough
+        return self._lexical_store is self.paragraphs
+
+    def _load_lexical_index(self):
+        # BM25 postings for the loaded paragraph store; rebuilt if missing or out of step
+        try:
+            if all(os.path.exists(p) for p in LexicalIndex.paths(self.lexical_index_prefix)):
+                self._lexical = LexicalIndex.load(self.lexical_index_prefix)
+                if self._lexical.matches(self.paragraphs):
+                    self._lexical_store = self.paragraphs
+                    return
+        except Exception as e:
+            print(f"[WARN] Failed to load lexical index (will rebuild): {e}")
+        self._lexical = LexicalIndex.build(self.paragraphs)
+        self._lexical_store = self.paragraphs
+        try:
+            self._lexical.save(self.lexical_index_prefix, self._atomic_write_npy)
+        except Exception as e:
+            print(f"[WARN] Could not persist lexical index: {e}")
 
     def _build_index(self):
-        # reset
+        # full rebuild: forget every indexed file, keep the roles/shared hashes
+        self.processed = {k: v for k, v in self.processed.items() if k in ("roles_file", "shared_file")}
         self.meta = []
-        self.paragraphs = []
-        # preserve processed if present else reset
-        if not os.path.exists(self.processed_file):
-            self.processed = {}
+        self.paragraphs = ParagraphStore()
+        self.id_ranges = {}
+        self._refresh_positions()
 
-        # collect data
-        meta, sections, paragraphs = self._load_documents()
+        dim = self._embedding_dim()
+        self.index = self._new_index(dim)
+        self.paragraph_index = self._new_index(dim)
+        self._indexes_readonly = False
 
-        if not sections:
+        if not self._update_store():
             print("⚠️ No documents found for indexing.")
-            return
-
-        # ensure fresh indexes
-        dim = self.model.get_sentence_embedding_dimension()
-        self.index = faiss.IndexFlatIP(dim)
-        self.paragraph_index = faiss.IndexFlatIP(dim)
-
-        # encode & add sections (guarded)
-        if sections:
-            section_vectors = self.model.encode(sections, convert_to_numpy=True).astype("float32")
-            faiss.normalize_L2(section_vectors)
-            self.index.add(section_vectors)
 
-        # encode & add paragraphs (use paragraph text) (guarded)
-        para_texts = [p['paragraph'] for p in paragraphs]
-        if para_texts:
-            para_vectors = self.model.encode(para_texts, convert_to_numpy=True).astype("float32")
-            faiss.normalize_L2(para_vectors)
-            self.paragraph_index.add(para_vectors)
-
-        # persist meta/paragraphs/processed/indexes
-        self.meta = meta
-        self.paragraphs = paragraphs
+    def update_index(self, workers=None):
+        """Sync the indexes with the RAG folder.
+           Vectors of changed or deleted files are removed, new and changed files are
+           embedded and added; unchanged files are left untouched. Files are parsed a few
+           ahead of the embedding stage and embedded in encode_batch_size chunks; with
+           checkpoint_every set the store is persisted between chunks, and a restart after
+           an interruption only re-processes the files after the last checkpoint.
+           Files whose size and mtime match processed_lite.json are not read at all; what
+           the scan found is kept in last_scan (see scan_changes()).
+           Like refresh(), the update runs on a copy while queries are served from the
+           current store, which it replaces once complete.
+           Returns True if anything changed."""
+        self._ready.wait()
+        with self._sync_lock:
+            shadow = self._shadow()
+            changed = shadow._update_store(workers)
+            if changed:
+                self._adopt_update(shadow)
+            else:
+                # nothing indexed changed; records of touched or removed files may have
+                self.processed, self.last_scan = shadow.processed, shadow.last_scan
+        return changed
+
+    def _update_store(self, workers=None):
+        # update_index() on this instance itself; callers make sure it is not being served
+        sources = self._source_files()
+        removed = self._removed_sources(sources)
+        deleted = [key for key in removed if key in self.id_ranges]
+        for key in removed:
+            self.processed.pop(key, None)
+        stale = [self.id_ranges.pop(key) for key in deleted]
+        scan = {"added": [], "changed": [], "removed": removed, "touched": [], "unchanged": 0}
+
+        # each changed file gets a contiguous id range past everything in use,
+        # so its old vectors can be dropped after the new ones are added
+        next_section = max([r["sections"][1] for r in self.id_ranges.values()] + [0])
+        next_paragraph = max([r["paragraphs"][1] for r in self.id_ranges.values()] + [0])
+        # kept paragraphs all have ids below first_new: their postings are merged, not rebuilt
+        first_new = next_paragraph
+        previous = self._lexical if self._lexical_current() else LexicalIndex()
+        started = time.perf_counter()
+
+        # embedding stage: parsed files stream in from the pool, encode in large batches
+        changed = 0
+        pending_meta, pending_paragraphs = [], []
+        new_paragraphs = []  # ParagraphStore per embedded batch
+        since_checkpoint = 0
+        for key, section_data, paragraph_data in self._load_documents(workers, sources, scan):
+            if key in self.id_ranges:
+                stale.append(self.id_ranges.pop(key))
+            self.id_ranges[key] = {"sections": [next_section, next_section + len(section_data)],
+                                   "paragraphs": [next_paragraph, next_paragraph + len(paragraph_data)]}
+            first_section = next_section
+            for entry in section_data:
+                entry["id"] = next_section
+                next_section += 1
+            for para in paragraph_data:
+                para["id"] = next_paragraph
+                para["section_id"] += first_section
+                next_paragraph += 1
+            pending_meta.extend(section_data)
+            pending_paragraphs.extend(paragraph_data)
+            changed += 1
+            if len(pending_paragraphs) >= self.encode_batch_size:
+                new_paragraphs.append(self._embed_pending(pending_meta, pending_paragraphs))
+                since_checkpoint += len(pending_paragraphs)
+                pending_meta, pending_paragraphs = [], []
+                if self.checkpoint_every and since_checkpoint >= self.checkpoint_every:
+                    # every file yielded so far is embedded: make it durable
+                    self._apply_changes(stale, new_paragraphs)
+                    self._persist_checkpoint()
+                    stale, new_paragraphs, since_checkpoint = [], [], 0
+        new_paragraphs.append(self._embed_pending(pending_meta, pending_paragraphs))
+        self.last_scan = scan
+        self._report_progress("scanned", len(scan["added"]), len(scan["changed"]), len(removed),
+                              len(scan["touched"]) + scan["unchanged"])
+
+        if not changed and not deleted:
+            if scan["touched"] or removed:
+                # new stat signatures for files whose content did not change
+                try:
+                    self._atomic_write_json(self.processed_file, self.processed)
+                except Exception as e:
+                    print(f"[WARN] Failed to persist processed files: {e}")
+            return False
 
+        self._apply_changes(stale, new_paragraphs)
+        # reclaim the bytes of removed paragraphs once they are a large share of the blob,
+        # so a small update does not pay for a pass over the whole store
+        if self.paragraphs.dead_bytes() > COMPACT_DEAD_FRACTION * len(self.paragraphs.blob):
+            with self._metrics.time("ingest", "compact", len(self.paragraphs)):
+                self.paragraphs = self.paragraphs.compact()
+        with self._metrics.time("ingest", "faiss_train"):
+            self.index = self._finalize_index(self.index)
+            self.paragraph_index = self._finalize_index(self.paragraph_index)
+
+        self._refresh_positions()
+        self._build_auth_index()
+        self._build_heading_index()
+        with self._metrics.time("ingest", "lexical_index", len(self.paragraphs)):
+            self._lexical = previous.merge(self.paragraphs, first_new)
+            self._lexical_store = self.paragraphs
+        self._invalidate_results()
+        self._persist_checkpoint(report=False)
+        self._metrics.record("ingest", "update", time.perf_counter() - started, changed)
+
+        print(f"✅ Index updated: {changed} changed, {len(deleted)} removed file(s); "
+              f"{len(self.meta)} sections, {len(self.paragraphs)} paragraphs.")
+        return True
+
+    def _apply_changes(self, stale, new_paragraphs):
+        # drop stale vectors and their records, append the newly embedded paragraphs;
+        # the store is only concatenated here, update_index compacts it at the end if needed
+        if stale:
+            self._own_indexes()
+            stale_sections = self._ids_in_ranges(r["sections"] for r in stale)
+            stale_paragraphs = self._ids_in_ranges(r["paragraphs"] for r in stale)
+            with self._metrics.time("ingest", "faiss_remove", len(stale_sections) + len(stale_paragraphs)):
+                self.index = self._remove_vectors(self.index, stale_sections)
+                self.paragraph_index = self._remove_vectors(self.paragraph_index, stale_paragraphs)
+            stale_sections = set(stale_sections.tolist())
+            self.meta = [m for m in self.meta if m["id"] not in stale_sections]
+            self.paragraphs = self.paragraphs.subset(~np.isin(self.paragraphs.ids, stale_paragraphs))
+        self.paragraphs = ParagraphStore.concat([self.paragraphs] + new_paragraphs)
+
+    def _persist_checkpoint(self, report=True):
+        with self._metrics.time("ingest", "persist"):
+            if self._roles_dirty:
+                self._persist_roles_and_shared()
+            self._persist_all()
+        if report:
+            self._report_progress("checkpoint", len(self.meta), len(self.paragraphs))
+
+    def _embed_pending(self, meta, paragraphs):
+        # encode & add one batch of new records; returns the batch's paragraph store
+        if meta or paragraphs:
+            self._own_indexes()
+        if meta:
+            self._add_vectors(self.index, [m['content'] for m in meta], [m["id"] for m in meta])
+        texts = [p['paragraph'] for p in paragraphs]
+        keys = [_text_digest(t) for t in texts]  # kept in the store: two-stage search finds cached vectors by them
+        if paragraphs:
+            self._add_vectors(self.paragraph_index, texts, [p["id"] for p in paragraphs], keys)
+        self.meta.extend(meta)
+        if meta or paragraphs:
+            self._report_progress("embedded", len(meta), len(paragraphs))
+        return ParagraphStore.build([p["id"] for p in paragraphs], [p["section_id"] for p in paragraphs], texts, keys)
+
+    def _persist_all(self):
+        # persist meta/paragraphs/processed/id ranges/indexes
         try:
             self._atomic_write_json(self.meta_file, self.meta)
         except Exception as e:
             print(f"[WARN] Failed to write meta file: {e}")
         try:
-            self._atomic_write_pickle(self.paragraphs_file, self.paragraphs)
+            self.paragraphs.save(self.paragraph_store_prefix, self._atomic_write_npy)
         except Exception as e:
-            print(f"[WARN] Failed to write paragraphs file: {e}")
+            print(f"[WARN] Failed to write paragraph store: {e}")
+        if self._lexical_current():  # merged at the end of update_index, not per checkpoint
+            try:
+                self._lexical.save(self.lexical_index_prefix, self._atomic_write_npy)
+            except Exception as e:
+                print(f"[WARN] Failed to write lexical index: {e}")
         try:
             self._atomic_write_json(self.processed_file, self.processed)
         except Exception as e:
             print(f"[WARN] Failed to write processed file: {e}")
+        try:
+            self._atomic_write_json(self.id_ranges_file, self.id_ranges)
+        except Exception as e:
+            print(f"[WARN] Failed to write id ranges file: {e}")
+        try:
+            self._atomic_write_json(self.index_config_file, self._index_config())
+        except Exception as e:
+            print(f"[WARN] Failed to write index config: {e}")
 
         try:
             self._atomic_write_faiss(self.index, self.index_file)
@@ -323,64 +1823,470 @@ class CompliMateLite:
         except Exception as e:
             print(f"[WARN] Failed to persist paragraph index: {e}")
 
-        print(f"✅ Index built: {len(sections)} sections, {len(paragraphs)} paragraphs.")
-
     # ------------------------
-    # Document loading & extraction
+    # Vector id helpers
     # ------------------------
-    def _load_documents(self):
-        meta = []
-        sections = []
-        paragraphs = []
+    def _new_index(self, dim):
+        # IVF backends and int8/PQ storage need training data, so they start as a flat
+        # staging index that _finalize_index converts
+        if self._needs_training():
+            return faiss.IndexIDMap2(faiss.IndexFlatIP(dim))
+        return self._configured_index(dim)
+
+    def _as_id_map(self, index_obj):
+        # stores written before incremental indexing hold plain flat indexes where id == position;
+        # IVF indexes keep ids natively
+        if isinstance(index_obj, (faiss.IndexIDMap2, faiss.IndexIVF)):
+            return index_obj
+        id_map = faiss.IndexIDMap2(index_obj.__class__(index_obj.d))
+        if index_obj.ntotal:
+            vecs = index_obj.reconstruct_n(0, index_obj.ntotal)
+            id_map.add_with_ids(vecs, np.arange(index_obj.ntotal, dtype="int64"))
+        return id_map
+
+    def _read_index(self, path):
+        # lazy instances map the index file instead of reading it into memory
+        flags = faiss.IO_FLAG_MMAP if self.lazy else 0
+        return self._tune_index(self._as_id_map(faiss.read_index(path, flags)))
+
+    def _load_indexes(self):
+        self.index = self._read_index(self.index_file)
+        self.paragraph_index = self._read_index(self.paragraph_index_file)
+        self._indexes_readonly = self.lazy
+
+    def _own_indexes(self):
+        # mmapped (read-only) or shared indexes are replaced by private copies before the first write
+        if self._indexes_readonly:
+            self.index = self._tune_index(self._as_id_map(faiss.read_index(self.index_file)))
+            self.paragraph_index = self._tune_index(self._as_id_map(faiss.read_index(self.paragraph_index_file)))
+            self._indexes_readonly = False
+
+    def _add_vectors(self, index_obj, texts, ids, keys=None):
+        vecs = self._encode_cached(texts, keys)
+        with self._metrics.time("ingest", "faiss_add", len(ids)):
+            faiss.normalize_L2(vecs)
+            index_obj.add_with_ids(vecs, np.asarray(ids, dtype="int64"))
+
+    def _reembed_sections(self):
+        # fresh section index from self.meta (vectors come from the embedding cache)
+        index_obj = self._new_index(self._embedding_dim())
+        if self.meta:
+            self._add_vectors(index_obj, [entry['content'] for entry in self.meta],
+                              [entry['id'] for entry in self.meta])
+        return self._finalize_index(index_obj)
+
+    def _reembed_paragraphs(self):
+        index_obj = self._new_index(self._embedding_dim())
+        if self.paragraphs:
+            self._add_vectors(index_obj, self.paragraphs.texts(), self.paragraphs.ids)
+        return self._finalize_index(index_obj)
+
+    def _ids_in_ranges(self, ranges):
+        parts = [np.arange(start, end, dtype="int64") for start, end in ranges]
+        return np.concatenate(parts) if parts else np.empty(0, dtype="int64")
 
-        # self.processed is expected to exist (either loaded or reset)
-        for filename in os.listdir(self.rag_folder_lite):
-            lower = filename.lower()
-            fullpath = os.path.join(self.rag_folder_lite, filename)
-            if lower.endswith(".pdf"):
-                docx_path = self._convert_pdf_to_docx(fullpath)
-                if not docx_path:
-                    print(f"[WARN] PDF -> DOCX conversion failed for {filename}, skipping.")
-                    continue
-            elif lower.endswith(".docx"):
-                docx_path = fullpath
+    # ------------------------
+    # Index backends
+    # ------------------------
+    def _index_config(self):
+        return {"backend": self.index_backend, "params": self.index_params}
+
+    def _build_config(self, config):
+        # the part of an index config that requires re-indexing when it changes
+        params = dict(DEFAULT_INDEX_PARAMS)
+        params.update(config.get("params", {}))
+        return config.get("backend", "flat"), tuple(params[k] for k in INDEX_BUILD_PARAMS)
+
+    def _tune_index(self, index_obj):
+        # apply search-time parameters (nprobe / efSearch)
+        if isinstance(index_obj, faiss.IndexIVF):
+            index_obj.nprobe = self.index_params["nprobe"]
+        elif isinstance(index_obj, faiss.IndexIDMap2):
+            base = faiss.downcast_index(index_obj.index)
+            if isinstance(base, faiss.IndexHNSW):
+                base.hnsw.efSearch = self.index_params["ef_search"]
+        return index_obj
+
+    def _needs_training(self):
+        return self.index_backend in ("ivf_flat", "ivf_pq") or self.index_params["storage"] in ("int8", "pq")
+
+    def _configured_index(self, dim, nlist=1):
+        # (untrained) index for the configured backend and storage
+        storage = "pq" if self.index_backend == "ivf_pq" else self.index_params["storage"]
+        ip = faiss.METRIC_INNER_PRODUCT
+        sq_type = {"fp16": faiss.ScalarQuantizer.QT_fp16, "int8": faiss.ScalarQuantizer.QT_8bit}.get(storage)
+        pq_m = self.index_params["pq_m"] or next(m for m in (48, 32, 24, 16, 8, 4, 2, 1) if dim % m == 0)
+        pq_bits = self.index_params["pq_bits"]
+        hnsw_m = self.index_params["hnsw_m"]
+
+        if self.index_backend in ("ivf_flat", "ivf_pq"):
+            # IVF indexes keep ids natively
+            quantizer = faiss.IndexFlatIP(dim)
+            if storage == "pq":
+                return faiss.IndexIVFPQ(quantizer, dim, nlist, pq_m, pq_bits, ip)
+            if sq_type is not None:
+                return faiss.IndexIVFScalarQuantizer(quantizer, dim, nlist, sq_type, ip)
+            return faiss.IndexIVFFlat(quantizer, dim, nlist, ip)
+
+        if self.index_backend == "hnsw":
+            if storage == "pq":
+                base = faiss.IndexHNSWPQ(dim, pq_m, hnsw_m, pq_bits, ip)
+            elif sq_type is not None:
+                base = faiss.IndexHNSWSQ(dim, sq_type, hnsw_m, ip)
             else:
+                base = faiss.IndexHNSWFlat(dim, hnsw_m, ip)
+            base.hnsw.efConstruction = self.index_params["ef_construction"]
+        elif storage == "pq":
+            base = faiss.IndexPQ(dim, pq_m, pq_bits, ip)
+        elif sq_type is not None:
+            base = faiss.IndexScalarQuantizer(dim, sq_type, ip)
+        else:
+            base = faiss.IndexFlatIP(dim)
+        return self._tune_index(faiss.IndexIDMap2(base))
+
+    def _finalize_index(self, index_obj):
+        """Train the configured backend / storage on the vectors held by a flat staging index."""
+        if not self._needs_training() or not isinstance(index_obj, faiss.IndexIDMap2):
+            return index_obj
+        if not isinstance(faiss.downcast_index(index_obj.index), faiss.IndexFlat):
+            return index_obj  # already trained
+        n, dim = index_obj.ntotal, index_obj.d
+        ivf = self.index_backend in ("ivf_flat", "ivf_pq")
+        nlist = max(1, min(self.index_params["nlist"] or int(4 * np.sqrt(n)), n // 39)) if ivf else 1
+        # k-means wants ~39 points per IVF cell; PQ codebooks want a dozen or so per code
+        pq = self.index_backend == "ivf_pq" or self.index_params["storage"] == "pq"
+        min_train = max(39 * nlist if ivf else 1, 16 * 2 ** self.index_params["pq_bits"] if pq else 1)
+        if n < min_train:
+            print(f"[WARN] {n} vectors are too few to train {self.index_backend}/"
+                  f"{self.index_params['storage']}, keeping a flat index for now.")
+            return index_obj
+
+        trained = self._configured_index(dim, nlist)
+        vecs = faiss.downcast_index(index_obj.index).reconstruct_n(0, n)
+        ids = faiss.vector_to_array(index_obj.id_map).astype("int64")
+        sample = vecs
+        if n > 256 * max(nlist, 256):
+            sample = vecs[np.random.default_rng(0).choice(n, 256 * max(nlist, 256), replace=False)]
+        trained.train(sample)
+        trained.add_with_ids(vecs, ids)
+        return self._tune_index(trained)
+
+    def _remove_vectors(self, index_obj, ids):
+        # HNSW cannot delete, so it is rebuilt from its own stored vectors minus the removed ids
+        base = faiss.downcast_index(index_obj.index) if isinstance(index_obj, faiss.IndexIDMap2) else index_obj
+        if not isinstance(base, faiss.IndexHNSW):
+            index_obj.remove_ids(ids)
+            return index_obj
+        vecs = base.reconstruct_n(0, index_obj.ntotal)
+        kept = faiss.vector_to_array(index_obj.id_map).astype("int64")
+        keep = ~np.isin(kept, ids)
+        rebuilt = self._new_index(index_obj.d)
+        if keep.any():
+            rebuilt.add_with_ids(vecs[keep], kept[keep])
+        return rebuilt
+
+    def _refresh_positions(self):
+        self._meta_pos = {m["id"]: i for i, m in enumerate(self.meta)}
+        self._auth = None
+        self._heading_keys = None
+
+    def _derive_id_ranges(self):
+        # legacy stores: files were appended contiguously, so each file's ids form a range
+        para_files = np.array([self.meta[self._meta_pos[sid]]["filename"] if sid in self._meta_pos else ""
+                               for sid in self.paragraphs.section_ids.tolist()], dtype=object)
+        for key in self.processed:
+            if key in ("roles_file", "shared_file"):
                 continue
+            name = self._docx_name(key)
+            sec_ids = [m["id"] for m in self.meta if m["filename"] == name]
+            para_ids = self.paragraphs.ids[para_files == name]
+            self.id_ranges[key] = {
+                "sections": [min(sec_ids), max(sec_ids) + 1] if sec_ids else [0, 0],
+                "paragraphs": [int(para_ids.min()), int(para_ids.max()) + 1] if len(para_ids) else [0, 0],
+            }
+
+    def _convert_legacy_paragraphs(self, records):
+        # paragraphs_lite.pkl held one dict per paragraph with its own copy of the section;
+        # ids there are list positions, sections are found by file, heading and content
+        for i, entry in enumerate(self.meta):
+            entry.setdefault("id", i)
+        section_ids = {}
+        for entry in self.meta:
+            section_ids.setdefault((entry["filename"], entry["heading"], entry["content"]), entry["id"])
+        return ParagraphStore.build(
+            [p.get("id", i) for i, p in enumerate(records)],
+            [p.get("section_id", section_ids.get((p["filename"], p["section_heading"], p["section_content"]), -1))
+             for p in records],
+            [p["paragraph"] for p in records])
+
+    def _docx_name(self, key):
+        # filename recorded in meta for a source file (PDFs are indexed via their converted .docx)
+        if key.lower().endswith(".pdf"):
+            key = key[:-4] + ".docx"
+        return os.path.basename(key)
 
-            # hash source file (pdf or docx) and use relpath key
-            source_path = fullpath
+    # ------------------------
+    # Embedding cache
+    # ------------------------
+    def _load_embedding_cache(self):
+        # cached rows are only valid for the model/dimension that produced them. Row i of
+        # the .f32 file is the vector of digest i of the .keys file; both are append-only
+        # and the .json header only names the model, so appends never rewrite it. Every
+        # instance and process using the folder writes them under embedding_lock_file.
+        self._emb_rows, self._emb_index = 0, None
+        try:
+            with _file_lock(self.embedding_lock_file):
+                self._open_embedding_cache()
+        except Exception as e:
+            print(f"[WARN] Could not lock embedding cache, starting empty: {e}")
+            self._emb_rows = 0
+        self._map_embedding_cache()
+
+    def _embedding_cache_meta(self):
+        # the cache header if it was written for this model (and dimension, once known)
+        if not os.path.exists(self.embedding_offsets_file):
+            return None
+        try:
+            with open(self.embedding_offsets_file, "r", encoding="utf-8") as f:
+                cache_meta = json.load(f)
+        except Exception as e:
+            print(f"[WARN] Could not load embedding cache index: {e}")
+            return None
+        if cache_meta.get("model") != self.model_name or (self._dim is not None and cache_meta.get("dim") != self._dim):
+            return None
+        return cache_meta
+
+    def _embedding_cache_rows(self, dim):
+        # complete rows on disk: an interrupted append can leave one file longer than the other
+        sizes = [os.path.getsize(path) if os.path.exists(path) else 0
+                 for path in (self.embedding_cache_file, self.embedding_keys_file)]
+        return min(sizes[0] // (dim * 4), sizes[1] // _DigestIndex.DIGEST_BYTES)
+
+    def _open_embedding_cache(self):
+        # _load_embedding_cache under the lock
+        cache_meta = self._embedding_cache_meta()
+        if cache_meta is not None and "rows" in cache_meta:
             try:
-                file_hash = self._get_file_hash(source_path)
+                cache_meta = self._migrate_embedding_cache(cache_meta)
             except Exception as e:
-                print(f"[ERROR] Failed hashing {source_path}: {e}")
-                continue    
+                print(f"[WARN] Could not load embedding cache index: {e}")
+                cache_meta = None
+
+        # both files are cut back to the rows present in each (interrupted append)
+        try:
+            dim = cache_meta.get("dim") if cache_meta else None
+            if dim:
+                self._emb_rows = self._embedding_cache_rows(dim)
+                if self._emb_rows:
+                    self._dim = dim
+            for path, width in ((self.embedding_cache_file, (self._dim or 0) * 4),
+                                (self.embedding_keys_file, _DigestIndex.DIGEST_BYTES)):
+                if os.path.exists(path) and os.path.getsize(path) != self._emb_rows * width:
+                    with open(path, "r+b") as f:
+                        f.truncate(self._emb_rows * width)
+        except Exception as e:
+            print(f"[WARN] Could not repair embedding cache, starting empty: {e}")
+            self._emb_rows = 0
+
+    def _migrate_embedding_cache(self, cache_meta):
+        # caches written before the .keys column kept a JSON {hex digest: row} map
+        rows = cache_meta.pop("rows")
+        digests = [None] * len(rows)
+        for key, row in rows.items():
+            digests[row] = bytes.fromhex(key)
+        with open(self.embedding_keys_file + ".tmp", "wb") as f:
+            f.write(b"".join(digests))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(self.embedding_keys_file + ".tmp", self.embedding_keys_file)
+        self._atomic_write_json(self.embedding_offsets_file, cache_meta)
+        return cache_meta
+
+    def _map_embedding_cache(self):
+        dim = self._dim
+        self._emb_matrix = None
+        if self._emb_rows and os.path.exists(self.embedding_cache_file):
+            self._emb_matrix = np.memmap(self.embedding_cache_file, dtype="float32", mode="r",
+                                         shape=(self._emb_rows, dim))
+
+    def _embedding_index(self):
+        # digests are only read when a lookup needs them (ingestion, rerank), not at startup
+        if self._emb_index is None:
+            digests = np.empty(0, dtype=_DigestIndex.DTYPE)
+            if self._emb_rows:
+                try:
+                    digests = np.fromfile(self.embedding_keys_file, dtype=_DigestIndex.DTYPE, count=self._emb_rows)
+                except Exception as e:
+                    print(f"[WARN] Could not read embedding cache keys: {e}")
+            self._emb_index = _DigestIndex(digests)
+        return self._emb_index
+
+    def _encode_cached(self, texts, keys=None):
+        """Encode texts, reusing cached vectors; only never-seen texts hit the model.
+           keys are the texts' _text_digest values, computed here if not given."""
+        dim = self._embedding_dim()
+        if keys is None:
+            keys = [_text_digest(t) for t in texts]
+        rows = self._embedding_index().lookup(keys)
+        missing = {}
+        for key, text, row in zip(keys, texts, rows):
+            if row < 0 and key not in missing:
+                missing[key] = text
+
+        fresh = np.empty((0, dim), dtype="float32")
+        self._metrics.count("ingest", "embedding_cache_hits", len(texts) - len(missing))
+        if missing:
+            with self._metrics.time("ingest", "encode", len(missing)):
+                fresh = self._encoder.encode(list(missing.values()), priority=_EncodeBatcher.INGEST)
+        fresh_pos = {key: i for i, key in enumerate(missing)}
+
+        vecs = np.empty((len(texts), dim), dtype="float32")
+        cached = np.flatnonzero(rows >= 0)
+        if len(cached):
+            vecs[cached] = self._emb_matrix[rows[cached]]
+        for i in np.flatnonzero(rows < 0):
+            vecs[i] = fresh[fresh_pos[keys[i]]]
+
+        if missing:
+            with self._metrics.time("ingest", "persist"):
+                self._append_embedding_cache(list(missing), fresh)
+        return vecs
+
+    def _append_embedding_cache(self, keys, vecs):
+        # other instances and processes may have appended since this one last looked: under
+        # the lock, their rows are read into the key index first and new rows go after them.
+        # Files are only cut back to the complete rows on disk, never to this instance's
+        # count. Vectors are made durable before their keys, so a key never names a missing row.
+        dim = self._embedding_dim()
+        index = self._embedding_index()
+        self._emb_matrix = None  # release the mapping before growing the file
+        try:
+            with _file_lock(self.embedding_lock_file):
+                start = self._embedding_cache_rows(dim) if self._embedding_cache_meta() is not None else 0
+                if start < len(index):
+                    # the cache was reset by an instance of another model: these rows are gone
+                    index = self._emb_index = _DigestIndex(np.fromfile(self.embedding_keys_file, dtype=_DigestIndex.DTYPE,
+                                                                       count=start) if start else None)
+                elif start > len(index):
+                    index.append(np.fromfile(self.embedding_keys_file, dtype=_DigestIndex.DTYPE, count=start - len(index),
+                                             offset=len(index) * _DigestIndex.DIGEST_BYTES))
+                self._emb_rows = start
+                self._write_embedding_rows(start, keys, vecs, dim)
+            index.append(keys)
+            self._emb_rows = len(index)
+        except Exception as e:
+            print(f"[WARN] Failed to persist embedding cache: {e}")
+        self._map_embedding_cache()
+
+    def _write_embedding_rows(self, start, keys, vecs, dim):
+        # _append_embedding_cache under the lock: rows start.. of both files
+        if not start:
+            self._atomic_write_json(self.embedding_offsets_file, {"model": self.model_name, "dim": dim})
+        for path, data, width in ((self.embedding_cache_file, np.ascontiguousarray(vecs, dtype="float32").tobytes(), dim * 4),
+                                  (self.embedding_keys_file, b"".join(keys), _DigestIndex.DIGEST_BYTES)):
+            with open(path, "ab") as f:
+                f.truncate(start * width)
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
 
-            key = os.path.relpath(source_path, self.rag_folder_lite)
-            if self.processed.get(key) == file_hash:
-                continue  # unchanged
+    # ------------------------
+    # Document loading & extraction
+    # ------------------------
+    def _load_documents(self, workers=None, sources=None, scan=None):
+        """Yield (key, section_data, paragraph_data) for every new or changed source file.
+           Files whose size and mtime match their record are skipped without being read;
+           hashing, PDF conversion and parsing of the rest fan out over a process pool and
+           come back in folder order. Access tags are inferred here because they update
+           the shared role maps. scan, if given, collects the added/changed/touched keys."""
+        if sources is None:
+            sources = self._source_files()
+        if scan is None:
+            scan = {"added": [], "changed": [], "removed": [], "touched": [], "unchanged": 0}
 
-           
+        # self.processed is expected to exist (either loaded or reset)
+        with self._metrics.time("ingest", "stat", len(sources)):
+            fresh = [self._stat_unchanged(fullpath, self.processed.get(key)) for key, fullpath in sources]
+        self._metrics.count("ingest", "files_unchanged", sum(fresh))
+        scan["unchanged"] += sum(fresh)
+        sources = [source for source, skip in zip(sources, fresh) if not skip]
+        if not sources:
+            return
 
-            # extract sections & paragraphs
-            section_data, paragraph_data = self._extract_sections(docx_path)
-            meta.extend(section_data)
-            sections.extend([s['content'] for s in section_data])
-            paragraphs.extend(paragraph_data)
+        paths = [fullpath for _, fullpath in sources]
+        known = [self.processed.get(key) for key, _ in sources]
+        workers = min(workers or self.ingest_workers or os.cpu_count() or 1, len(sources))
+        pool = None
+        if workers > 1:
+            try:
+                pool = ProcessPoolExecutor(max_workers=workers, mp_context=_ingest_pool_context())
+            except Exception as e:
+                print(f"[WARN] Could not start ingestion pool, parsing serially: {e}")
+        # at most two files per worker are parsed ahead of the embedding stage
+        results = self._prepare_ahead(pool, paths, known, 2 * workers) if pool else map(_prepare_source, paths, known)
 
-            # update processed map
-            self.processed[key] = file_hash
+        try:
+            for (key, fullpath), (status, record, docx_path, sections, timings) in zip(sources, results):
+                for stage, (seconds, items) in timings.items():
+                    self._metrics.record("ingest", stage, seconds, items)
+                self._metrics.count("ingest", f"files_{status}")
+                if status == "unchanged":
+                    # touched but not edited: keep the new stat signature, skip the parse
+                    self.processed[key] = record
+                    scan["touched"].append(key)
+                    continue
+                if status == "error":
+                    continue
+                if status == "failed":
+                    print(f"[WARN] PDF -> DOCX conversion failed for {os.path.basename(fullpath)}, skipping.")
+                    continue
 
-        # update meta file AFTER processing (will be saved by _build_index)
-        return meta, sections, paragraphs
+                # extract sections & paragraphs
+                section_data, paragraph_data = self._extract_sections(docx_path, sections)
+
+                # update processed map (saved by update_index)
+                scan["changed" if key in self.processed else "added"].append(key)
+                self.processed[key] = record
+                self._report_progress("parsed", key, len(section_data))
+                yield key, section_data, paragraph_data
+        finally:
+            if pool:
+                pool.shutdown(cancel_futures=True)
+
+    def _prepare_ahead(self, pool, paths, known, window):
+        # like pool.map, but submits only `window` files past the one being consumed,
+        # so parsed documents never pile up in memory
+        jobs = iter(zip(paths, known))
+        pending = deque(pool.submit(_prepare_source, *job) for job in itertools.islice(jobs, window))
+        while pending:
+            future = pending.popleft()
+            for job in itertools.islice(jobs, 1):
+                pending.append(pool.submit(_prepare_source, *job))
+            yield future.result()
+
+    def _report_progress(self, stage, *info):
+        self._set_status(stage=stage, info=info)
+        if self.progress:
+            self.progress(stage, *info)
+        elif stage == "parsed":
+            print(f"[INFO] Parsed {info[0]}: {info[1]} sections")
+        elif stage == "checkpoint":
+            print(f"[INFO] Checkpoint saved: {info[0]} sections, {info[1]} paragraphs")
+        elif stage == "scanned":
+            print(f"[INFO] Scanned RAG folder: {info[0]} added, {info[1]} changed, "
+                  f"{info[2]} removed, {info[3]} unchanged")
+        else:
+            print(f"[INFO] Embedded {info[0]} sections, {info[1]} paragraphs")
 
-    def _extract_sections(self, docx_path):
+    def _extract_sections(self, docx_path, sections=None):
         section_data = []
         paragraph_data = []
 
-        sections = self._split_into_sections(docx_path)
-        for heading, content in sections:
-            access_tag = self._infer_access_tag(heading)
-
+        if sections is None:
+            sections = self._split_into_sections(docx_path)
+        with self._metrics.time("ingest", "infer_access_tag", len(sections)):
+            access_tags = self._infer_access_tags([heading for heading, _ in sections])
+        for (heading, content), access_tag in zip(sections, access_tags):
             section_record = {
                 "filename": os.path.basename(docx_path),
                 "heading": heading,
@@ -393,51 +2299,50 @@ class CompliMateLite:
             for para in content.split("\n"):
                 p = para.strip()
                 if p:
+                    # filename/heading/access tag are read from the section via section_id
                     paragraph_data.append({
-                        "filename": os.path.basename(docx_path),
-                        "section_heading": heading,
-                        "section_content": content,
                         "paragraph": p,
-                        "access_tag": access_tag
+                        "section_id": len(section_data) - 1,  # local; rebased to the section's id on indexing
                     })
 
         return section_data, paragraph_data
 
     def _split_into_sections(self, filepath):
         try:
-            doc = Document(filepath)
-            sections = []
-            current_heading = "Introduction"
-            current_content = []
-            table_index = 0
-            elements = list(doc.element.body.iterchildren())
-
-            for el in elements:
-                if el.tag.endswith("}p"):
-                    para = next((p for p in doc.paragraphs if p._element == el), None)
-                    if not para:
-                        continue
-                    if self._is_heading(para):
-                        if current_content:
-                            sections.append((current_heading, "\n".join(current_content)))
-                        current_heading = para.text.strip()
-                        current_content = []
-                    else:
-                        current_content.append(para.text.strip())
-                elif el.tag.endswith("}tbl"):
-                    table = next((t for t in doc.tables if t._element == el), None)
-                    if table:
-                        rows = [" | ".join(cell.text.strip() for cell in row.cells) for row in table.rows]
-                        current_content.append("\n".join(rows))
-
-            if current_content:
-                sections.append((current_heading, "\n".join(current_content)))
-            return sections
+            return list(self._iter_sections(filepath))
         except Exception as e:
             print(f"[ERROR] Failed to parse {filepath}: {e}")
             return []
 
-    def _is_heading(self, para):
+    def _iter_sections(self, filepath):
+        """Yield (heading, content) pairs walking the document body once.
+           Body elements are wrapped directly instead of being looked up in
+           doc.paragraphs / doc.tables, which python-docx rebuilds on every access."""
+        doc = Document(filepath)
+        parent = doc._body
+        style_names = {}  # style id -> resolved style name, per document
+        current_heading = "Introduction"
+        current_content = []
+
+        for el in doc.element.body.iterchildren():
+            if el.tag.endswith("}p"):
+                para = Paragraph(el, parent)
+                if self._is_heading(para, style_names):
+                    if current_content:
+                        yield current_heading, "\n".join(current_content)
+                    current_heading = para.text.strip()
+                    current_content = []
+                else:
+                    current_content.append(para.text.strip())
+            elif el.tag.endswith("}tbl"):
+                table = Table(el, parent)
+                rows = [" | ".join(cell.text.strip() for cell in row.cells) for row in table.rows]
+                current_content.append("\n".join(rows))
+
+        if current_content:
+            yield current_heading, "\n".join(current_content)
+
+    def _is_heading(self, para, style_names=None):
         text = para.text.strip()
         if not text:
             return False
@@ -445,13 +2350,25 @@ class CompliMateLite:
             # Bold run OR style name containing "heading"
             if any(run.bold and (run.font.size is None or run.font.size.pt >= 10) for run in para.runs):
                 return True
-            if para.style and getattr(para.style, "name", None) and "heading" in para.style.name.lower():
+            name = self._style_name(para, style_names)
+            if name and "heading" in name.lower():
                 return True
         except Exception:
             # defensive
             pass
         return False
 
+    def _style_name(self, para, style_names=None):
+        # para.style resolves the style by scanning styles.xml, so memoize by style id
+        if style_names is None:
+            style = para.style
+            return getattr(style, "name", None) if style else None
+        style_id = para._p.style
+        if style_id not in style_names:
+            style = para.style
+            style_names[style_id] = getattr(style, "name", None) if style else None
+        return style_names[style_id]
+
     # ------------------------
     # Role / access helpers
     # ------------------------
@@ -463,40 +2380,110 @@ class CompliMateLite:
         return len(set_a & set_b) / len(set_a | set_b)
 
     def _infer_access_tag(self, heading):
-        max_sim = 0.0
-        best_role = None
-        for role, keywords in ROLE_FILE_MAP.items():
-            for keyword in keywords:
-                sim = self._keyword_similarity(heading, keyword)
-                if sim > max_sim:
-                    max_sim = sim
-                    best_role = role
-
-        # threshold tuned lower to be inclusive; unmatched default -> shared
-        if max_sim >= KEYWORD_SIM_THRESHOLD:
-            return best_role
-        else:
-            if heading not in shared_items:
-                shared_items.append(heading)
-                for role in ROLE_FILE_MAP:
-                    if heading not in ROLE_FILE_MAP[role]:
-                        ROLE_FILE_MAP[role].append(heading)
-                # persist learned roles/shared
-                try:
-                    self._persist_roles_and_shared()
-                except Exception as e:
-                    print(f"[WARN] Failed persisting learned roles/shared: {e}")
-            return "shared"
+        return self._infer_access_tags([heading])[0]
+
+    def _infer_access_tags(self, headings):
+        """Role (or "shared") per heading: the role whose keyword has the highest
+           _keyword_similarity, if it reaches KEYWORD_SIM_THRESHOLD. Unmatched headings
+           become shared keywords of every role, also for the headings after them.
+           All headings are scored against the keyword index in one batch."""
+        global _keyword_index
+        with _ROLES_LOCK:
+            if _keyword_index is None:
+                _keyword_index = _KeywordIndex(ROLE_FILE_MAP)
+            elif _keyword_index.signature != _roles_signature():
+                _keyword_index.sync(ROLE_FILE_MAP)
+            index = _keyword_index
+            token_sets = [set(h.lower().split()) for h in headings]
+            best, winner = index.best(token_sets)
+
+            # headings learned earlier in this batch are keywords of every role (first role wins ties)
+            tags = []
+            learned, learned_postings = [], {}
+            for heading, tokens, sim, rank in zip(headings, token_sets, best, winner):
+                role = index.roles[rank] if rank >= 0 else None
+                overlaps = {}
+                for t in tokens:
+                    for j in learned_postings.get(t, ()):
+                        overlaps[j] = overlaps.get(j, 0) + 1
+                for j, inter in overlaps.items():
+                    learned_sim = inter / (len(tokens) + len(learned[j]) - inter)
+                    if learned_sim >= sim:
+                        sim, role = learned_sim, index.roles[0]
+
+                # threshold tuned lower to be inclusive; unmatched default -> shared
+                if sim >= KEYWORD_SIM_THRESHOLD:
+                    tags.append(role)
+                    continue
+                if _add_shared_item(heading):
+                    self._roles_dirty = True  # written once by update_index
+                    for t in tokens:
+                        learned_postings.setdefault(t, []).append(len(learned))
+                    learned.append(tokens)
+                tags.append("shared")
+            return tags
 
     def _is_authorized(self, user_role, heading):
+        # decisions are precomputed per heading; rebuild if the role maps grew since
+        auth = self._auth
+        if auth is None or auth.signature != self._roles_signature():
+            auth = self._build_auth_index()
+        allowed = auth.decisions.get(heading)
+        if allowed is None:
+            # heading not in meta: no access tag, keyword match only
+            allowed = auth.decisions[heading] = self._authorized_roles(heading, None, auth.postings)
+        return allowed is True or user_role in allowed
+
+    # ------------------------
+    # Authorization index
+    # ------------------------
+    def _roles_signature(self):
+        return _roles_signature()
+
+    def _build_auth_index(self):
+        """Precompute the _is_authorized decision for every indexed heading and role;
+           returns the published _AuthIndex."""
+        with _ROLES_LOCK:
+            return self._build_auth_index_locked()
+
+    def _build_auth_index_locked(self):
+        # built in locals and published with one assignment: concurrent readers keep
+        # using the previous table until this one is complete
+        role_postings = {}
+        for role, keywords in ROLE_FILE_MAP.items():
+            postings = {}
+            sizes = []
+            for i, kw in enumerate(keywords):
+                tokens = set(kw.lower().split())
+                sizes.append(len(tokens))
+                for tok in tokens:
+                    postings.setdefault(tok, []).append(i)
+            role_postings[role] = (postings, sizes)
+
+        decisions = {}
+        for entry in self.meta:
+            heading = entry.get("heading", "")
+            if heading not in decisions:  # first meta entry decides the access tag
+                decisions[heading] = self._authorized_roles(heading, entry.get("access_tag"), role_postings)
+        self._auth = _AuthIndex(self._roles_signature(), role_postings, decisions)
+        return self._auth
+
+    def _authorized_roles(self, heading, access_tag, role_postings):
         # allow shared headings for all roles
-        meta_entry = next((m for m in self.meta if m.get("heading") == heading), None)
-        if meta_entry and meta_entry.get("access_tag") == "shared":
+        if access_tag == "shared":
             return True
-        for kw in ROLE_FILE_MAP.get(user_role, []):
-            if self._keyword_similarity(heading, kw) >= KEYWORD_SIM_THRESHOLD:
-                return True
-        return False
+        # otherwise a role needs one keyword with Jaccard similarity >= threshold;
+        # only keywords sharing a token with the heading can reach it
+        tokens = set(heading.lower().split())
+        roles = set()
+        for role, (postings, sizes) in role_postings.items():
+            overlap = {}
+            for tok in tokens:
+                for i in postings.get(tok, ()):
+                    overlap[i] = overlap.get(i, 0) + 1
+            if any(n / (len(tokens) + sizes[i] - n) >= KEYWORD_SIM_THRESHOLD for i, n in overlap.items()):
+                roles.add(role)
+        return frozenset(roles)
 
     # ------------------------
     # Retrieval
@@ -504,73 +2491,564 @@ class CompliMateLite:
     def _heading_fuzzy_matches(self, query, threshold=HEADING_FUZZY_THRESHOLD):
         """Return list of meta entries where heading fuzzy/substring matches query.
            Sorted by ratio desc."""
+        return [e for _, e in self._heading_fuzzy_scored(query, threshold)]
+
+    def _heading_fuzzy_scored(self, query, threshold=HEADING_FUZZY_THRESHOLD):
+        # (ratio, meta entry) pairs behind _heading_fuzzy_matches
         if not self.meta:
             return []
+        if self._heading_keys is None:
+            self._build_heading_index()
         q = query.strip().lower()
-        matches = []
-        for entry in self.meta:
-            heading = entry.get("heading", "")
-            h_lower = heading.lower()
-            ratio = SequenceMatcher(None, q, h_lower).ratio()
-            if q in h_lower or ratio >= threshold:
-                matches.append((ratio, entry))
-        matches.sort(key=lambda x: x[0], reverse=True)
-        return [e for _, e in matches]
+        keys = self._heading_keys
+
+        # substring hits always match; their ratio is still needed for ordering
+        ratios = {i: SequenceMatcher(None, q, keys[i]).ratio() for i in self._heading_substring_hits(q)}
+
+        # ratio = 2*M/(len(q)+len(h)); M is bounded by the shorter length and by the shared
+        # character counts, so only headings passing both bounds get an exact SequenceMatcher
+        lo, hi = self._heading_length_window(len(q), threshold)
+        if hi > lo:
+            shared = np.minimum(self._heading_counts[lo:hi], self._char_bins(q)).sum(axis=1)
+            bound = 2.0 * shared / np.maximum(len(q) + self._heading_lens[lo:hi], 1)
+            for j in np.nonzero(bound >= threshold - 1e-9)[0]:
+                i = lo + int(j)
+                if i not in ratios:
+                    ratio = SequenceMatcher(None, q, keys[i]).ratio()
+                    if ratio >= threshold:
+                        ratios[i] = ratio
+
+        # same order as a stable sort of meta by ratio desc
+        matches = [(ratio, pos) for i, ratio in ratios.items() for pos in self._heading_entries[i]]
+        matches.sort(key=lambda x: (-x[0], x[1]))
+        return [(ratio, self.meta[pos]) for ratio, pos in matches]
+
+    # ------------------------
+    # Heading index
+    # ------------------------
+    def _build_heading_index(self):
+        """Index unique lowercase headings for _heading_fuzzy_matches: sorted lengths,
+           hashed character counts and one separator-joined string for substring search."""
+        positions = {}
+        for pos, entry in enumerate(self.meta):
+            positions.setdefault(entry.get("heading", "").lower(), []).append(pos)
+        keys = sorted(positions, key=len)
+        self._heading_keys = keys
+        self._heading_entries = [positions[k] for k in keys]
+        self._heading_lens = np.array([len(k) for k in keys], dtype="int64")
+        self._heading_counts = np.array([self._char_bins(k) for k in keys], dtype="int32").reshape(len(keys), 64)
+        self._heading_blob = "\x00".join(keys)
+        self._heading_starts = []
+        start = 0
+        for k in keys:
+            self._heading_starts.append(start)
+            start += len(k) + 1
+
+    def _char_bins(self, text):
+        # character counts folded into 64 bins; folding only over-counts shared characters
+        codes = np.frombuffer(text.encode("utf-32-le"), dtype="uint32") % 64
+        return np.bincount(codes, minlength=64)
+
+    def _heading_length_window(self, q_len, threshold):
+        # headings whose length alone allows 2*min/(q_len+len) >= threshold
+        if threshold <= 0:
+            return 0, len(self._heading_keys)
+        if threshold > 1:
+            return 0, 0
+        min_len = int(q_len * threshold / (2 - threshold)) - 1
+        max_len = int(q_len * (2 - threshold) / threshold) + 1
+        return (int(np.searchsorted(self._heading_lens, min_len, side="left")),
+                int(np.searchsorted(self._heading_lens, max_len, side="right")))
+
+    def _heading_substring_hits(self, q):
+        keys = self._heading_keys
+        if not q or "\x00" in q:
+            return [i for i, k in enumerate(keys) if q in k]
+        hits = []
+        pos = self._heading_blob.find(q)
+        while pos != -1:
+            i = bisect_right(self._heading_starts, pos) - 1
+            hits.append(i)
+            pos = self._heading_blob.find(q, self._heading_starts[i] + len(keys[i]) + 1)
+        return hits
 
     def _semantic_paragraph_search(self, prompt, top_k=5):
-        if not self.paragraph_index or not self.paragraphs or getattr(self.paragraph_index, "ntotal", 0) == 0:
-            return []
-        qvec = self.model.encode([prompt], convert_to_numpy=True).astype("float32")
-        faiss.normalize_L2(qvec)
-        D, I = self.paragraph_index.search(qvec, top_k)
+        return [self._paragraph_record(pos) for _, pos in self._semantic_paragraph_scored_many([prompt], top_k)[0]]
+
+    def _paragraph_record(self, pos):
+        # dict view of one stored paragraph, joined with its section
+        section = self.get_section(int(self.paragraphs.section_ids[pos])) or {}
+        return {
+            "filename": section.get("filename"),
+            "section_heading": section.get("heading"),
+            "section_content": section.get("content"),
+            "paragraph": self.paragraphs.text(pos),
+            "access_tag": section.get("access_tag", "shared"),
+            "id": int(self.paragraphs.ids[pos]),
+            "section_id": int(self.paragraphs.section_ids[pos]),
+        }
+
+    def _paragraph_scored_many(self, prompts, top_k=5, user_role=None):
+        # (score, paragraph position, phase) lists: dense hits, fused with BM25 hits in hybrid mode.
+        # Short identifier queries whose terms all occur in some paragraph are answered from
+        # the postings alone. With user_role, both searches only cover paragraphs the role may read.
+        metrics = self._metrics
+        role_filter = self._role_filter(user_role) if user_role is not None else None
+        if not (self.hybrid and len(self._lexical) and self._lexical_current()):
+            with metrics.time("query", "semantic", len(prompts)):
+                return [[(score, pos, "semantic") for score, pos in results]
+                        for results in self._semantic_paragraph_scored_many(prompts, top_k, role_filter)]
+
+        mask = role_filter.mask if role_filter is not None and role_filter.paragraphs.selector is not None else None
+        with metrics.time("query", "lexical", len(prompts)):
+            tokens = [_lexical_tokens(p) for p in prompts]
+            lexical = [self._lexical.search(t, top_k, mask) for t in tokens]
+        out = [None] * len(prompts)
+        dense_rows = []
+        for i, (toks, hits) in enumerate(zip(tokens, lexical)):
+            exact = [hit for hit in hits if hit[2]]
+            if exact and len(toks) <= EXACT_TERM_MAX_TOKENS and _has_identifier(toks):
+                out[i] = [(1.0 / (RRF_K + rank), pos, "lexical") for rank, (_, pos, _) in enumerate(exact, 1)]
+                metrics.count("query", "exact_term")
+            else:
+                dense_rows.append(i)
+        if dense_rows:
+            with metrics.time("query", "semantic", len(dense_rows)):
+                dense = self._semantic_paragraph_scored_many([prompts[i] for i in dense_rows], top_k, role_filter)
+            for i, sem in zip(dense_rows, dense):
+                out[i] = self._fuse_ranks(sem, lexical[i], top_k)
+        return out
+
+    def _fuse_ranks(self, dense, lexical, top_k):
+        # reciprocal-rank fusion of the dense and BM25 rankings
+        fused = {}
+        for rank, (_, pos) in enumerate(dense, 1):
+            fused[pos] = [1.0 / (RRF_K + rank), "semantic"]
+        for rank, (_, pos, _) in enumerate(lexical, 1):
+            fused.setdefault(pos, [0.0, "lexical"])[0] += 1.0 / (RRF_K + rank)
+        ranked = sorted(fused.items(), key=lambda item: -item[1][0])[:top_k]
+        return [(score, pos, phase) for pos, (score, phase) in ranked]
+
+    def _semantic_paragraph_scored_many(self, prompts, top_k=5, role_filter=None):
+        # one encode batch and one multi-row FAISS search for all prompts -> (score, paragraph position) lists
+        if not prompts or not self.paragraph_index or not self.paragraphs or getattr(self.paragraph_index, "ntotal", 0) == 0:
+            return [[] for _ in prompts]
+        if role_filter is not None and not len(role_filter.paragraphs.ids):
+            return [[] for _ in prompts]
+        qvecs = self._encode_prompts(prompts)
+        if self.index_params.get("section_candidates") and getattr(self.index, "ntotal", 0):
+            with self._metrics.time("query", "two_stage", len(prompts)):
+                results = self._two_stage_scored(qvecs, top_k, role_filter)
+            if results is not None:
+                return results
+            self._metrics.count("query", "two_stage_fallback")
+        rerank = self.index_params.get("rerank") or 0
+        with self._metrics.time("query", "faiss_search", len(prompts)):
+            D, I = self._filtered_search(self.paragraph_index, qvecs, max(top_k, rerank),
+                                         role_filter.paragraphs if role_filter is not None else None)
+        if rerank:
+            with self._metrics.time("query", "rerank", len(prompts)):
+                D, I = self._rerank_exact(qvecs, D, I, min(top_k, I.shape[1]))
+
+        all_results = []
+        for scores, row in zip(D, I):
+            results = []
+            for score, idx in zip(scores, row):
+                pos = self.paragraphs.position(int(idx)) if idx >= 0 else None
+                if pos is None:
+                    continue
+                results.append((float(score), pos))
+            all_results.append(results)
+        return all_results
+
+    def _role_filter(self, user_role):
+        # readable paragraphs / sections of user_role, cached until the store or the role maps change
+        signature = self._roles_signature()
+        cached = self._role_filters.get(user_role)
+        if cached is not None and cached[:2] == (self._generation, signature):
+            return cached[2]
+        with self._metrics.time("query", "role_filter"):
+            readable = np.array([m["id"] for m in self.meta if self._is_authorized(user_role, m.get("heading", ""))],
+                                dtype="int64")
+            mask = np.isin(self.paragraphs.section_ids, readable)
+            sections = np.sort(np.array([m["id"] for m in self.meta], dtype="int64"))
+            role_filter = _RoleFilter(mask, self._id_filter(np.asarray(self.paragraphs.ids), mask),
+                                      self._id_filter(sections, np.isin(sections, readable)))
+        self._role_filters[user_role] = (self._generation, signature, role_filter)
+        return role_filter
+
+    def _id_filter(self, ids, keep):
+        # ids: all vector ids of an index (ascending), keep: which of them may be returned
+        if keep.all():
+            return _IdFilter(ids, None, None)
+        ids = ids[keep]
+        bits = np.zeros(int(ids[-1]) + 1 if len(ids) else 0, dtype=bool)
+        bits[ids] = True
+        bitmap = np.packbits(bits, bitorder="little")
+        return _IdFilter(ids, faiss.IDSelectorBitmap(len(bitmap), faiss.swig_ptr(bitmap)), bitmap)  # size in bytes
+
+    def _filtered_search(self, index_obj, qvecs, k, id_filter):
+        # FAISS search over the filter's vectors only, so a role gets k hits it may see
+        if id_filter is None or id_filter.selector is None:
+            return index_obj.search(qvecs, k)
+        k = min(k, len(id_filter.ids))
+        if not k:
+            return np.empty((len(qvecs), 0), dtype="float32"), np.empty((len(qvecs), 0), dtype="int64")
+        params = self._selector_params(index_obj, id_filter.selector)
+        if params is None:
+            return self._search_over_fetching(index_obj, qvecs, k, id_filter)
+        D, I = index_obj.search(qvecs, k, params=params)
+        short = (I >= 0).sum(axis=1) < k
+        if short.any():
+            # a narrow filter can starve a graph walk / the probed lists: retry those rows wider
+            D[short], I[short] = index_obj.search(
+                qvecs[short], k, params=self._selector_params(index_obj, id_filter.selector, widen=True))
+            short = (I >= 0).sum(axis=1) < k
+            if short.any():
+                D[short], I[short] = self._search_exhaustive(index_obj, qvecs[short], k, id_filter)
+        return D, I
+
+    def _search_exhaustive(self, index_obj, qvecs, k, id_filter):
+        # last resort for filters so narrow that no graph walk reaches k of their vectors:
+        # score the filter's stored vectors directly
+        try:
+            vecs = index_obj.reconstruct_batch(id_filter.ids)
+        except Exception:
+            return self._search_over_fetching(index_obj, qvecs, k, id_filter)
+        scores = qvecs @ vecs.T
+        best = np.argsort(-scores, axis=1, kind="stable")[:, :k]
+        return np.take_along_axis(scores, best, axis=1).astype("float32"), id_filter.ids[best]
+
+    def _selector_params(self, index_obj, selector, widen=False):
+        # search parameters of the backend's type carrying the id selector (None if it takes none)
+        base = faiss.downcast_index(index_obj.index if isinstance(index_obj, faiss.IndexIDMap2) else index_obj)
+        if isinstance(base, faiss.IndexHNSW):
+            ef = base.hnsw.efSearch
+            return faiss.SearchParametersHNSW(sel=selector, efSearch=4 * ef if widen else ef)
+        if isinstance(base, faiss.IndexIVF):
+            return faiss.SearchParametersIVF(sel=selector, nprobe=base.nlist if widen else base.nprobe)
+        if isinstance(base, faiss.IndexPQ):
+            return None
+        return faiss.SearchParameters(sel=selector)
+
+    def _search_over_fetching(self, index_obj, qvecs, k, id_filter):
+        # for backends without selector support: widen the search until every row has k readable hits
+        ntotal = index_obj.ntotal
+        fetch = min(ntotal, -(-k * ntotal // len(id_filter.ids)))
+        while True:
+            D, I = index_obj.search(qvecs, fetch)
+            readable = np.isin(I, id_filter.ids)
+            if fetch >= ntotal or (readable.sum(axis=1) >= k).all():
+                break
+            fetch = min(ntotal, 2 * fetch)
+        out_d = np.full((len(qvecs), k), -np.inf, dtype="float32")
+        out_i = np.full((len(qvecs), k), -1, dtype="int64")
+        for row in range(len(qvecs)):
+            cols = np.flatnonzero(readable[row])[:k]
+            out_d[row, :len(cols)] = D[row, cols]
+            out_i[row, :len(cols)] = I[row, cols]
+        return out_d, out_i
 
-        results = []
-        for idx in I[0]:
-            if idx < 0 or idx >= len(self.paragraphs):
+    # ------------------------
+    # Two-stage retrieval
+    # ------------------------
+    def _section_offsets(self):
+        """Paragraph-to-section offset table for the current store, built on first use:
+           store positions grouped by section (None if the store is already in section
+           order), the section ids present and each one's start in that grouping."""
+        table = self._section_table
+        if table is not None and table[0] == self._generation:
+            return table[1:]
+        section_ids = np.asarray(self.paragraphs.section_ids)
+        order = None
+        if len(section_ids) > 1 and (np.diff(section_ids) < 0).any():
+            order = np.argsort(section_ids, kind="stable")
+            section_ids = section_ids[order]
+        keys, starts = np.unique(section_ids, return_index=True)
+        starts = np.append(starts, len(section_ids)).astype("int64")
+        self._section_table = (self._generation, order, keys, starts)
+        return self._section_table[1:]
+
+    def _paragraph_vectors(self, positions):
+        # float32 vectors of store positions: embedding cache rows found by the store's keys,
+        # reconstructed from the paragraph index where the cache lacks them (None if it can't)
+        vecs = np.empty((len(positions), self._embedding_dim()), dtype="float32")
+        rows = np.full(len(positions), -1, dtype="int64")
+        if self._emb_matrix is not None:
+            rows = self._embedding_index().lookup(self.paragraphs.keys[positions])
+        cached = rows >= 0
+        if cached.any():
+            vecs[cached] = self._emb_matrix[rows[cached]]
+        if not cached.all():
+            try:
+                vecs[~cached] = self.paragraph_index.reconstruct_batch(
+                    np.ascontiguousarray(self.paragraphs.ids[positions[~cached]], dtype="int64"))
+            except Exception:
+                return None
+        return vecs
+
+    def _two_stage_scored(self, qvecs, top_k, role_filter=None):
+        # stage 1: the section index proposes section_candidates sections (readable ones only);
+        # stage 2: their paragraphs are scored exactly, so the cost follows the candidate set
+        # rather than the paragraph corpus. None if their vectors are not available.
+        order, keys, starts = self._section_offsets()
+        n_sections = self.index_params["section_candidates"]
+        _, S = self._filtered_search(self.index, qvecs, n_sections,
+                                     role_filter.sections if role_filter is not None else None)
+        all_results = []
+        for q, section_row in zip(qvecs, S):
+            found = np.searchsorted(keys, section_row)
+            known = (section_row >= 0) & (found < len(keys))
+            known[known] = keys[found[known]] == section_row[known]
+            spans = [np.arange(starts[i], starts[i + 1]) for i in found[known]]
+            positions = np.concatenate(spans) if spans else np.empty(0, dtype="int64")
+            if order is not None:
+                positions = order[positions]
+            if not len(positions):
+                all_results.append([])
                 continue
-            results.append(self.paragraphs[idx])
-        return results
+            vecs = self._paragraph_vectors(positions)
+            if vecs is None:
+                return None
+            scores = vecs @ q / np.maximum(np.linalg.norm(vecs, axis=1), 1e-12)
+            best = np.argsort(-scores, kind="stable")[:top_k]
+            all_results.append([(float(scores[i]), int(positions[i])) for i in best])
+        return all_results
+
+    def _encode_prompts(self, prompts):
+        # normalized query vectors; repeated prompts come from the prompt embedding cache
+        keys = [self._prompt_key(p) for p in prompts]
+        vecs = [self._prompt_vec_cache.get(k) for k in keys]
+        missing = [i for i, v in enumerate(vecs) if v is None]
+        self._metrics.count("query", "prompt_cache_hits", len(prompts) - len(missing))
+        if missing:
+            with self._metrics.time("query", "encode", len(missing)):
+                fresh = self._encoder.encode([prompts[i] for i in missing])
+            faiss.normalize_L2(fresh)
+            for i, vec in zip(missing, fresh):
+                vecs[i] = vec
+                self._prompt_vec_cache.put(keys[i], vec)
+        return np.stack(vecs)
+
+    def _encode_batch(self, texts):
+        return self.model.encode(texts, convert_to_numpy=True).astype("float32")
+
+    def _prompt_key(self, prompt):
+        # the model is uncased and ignores surrounding whitespace, as does heading matching
+        return prompt.strip().lower()
+
+    def _result_key(self, prompt, user_role, top_k):
+        return self._generation, self._roles_signature(), self._prompt_key(prompt), user_role, top_k
+
+    def _invalidate_results(self):
+        # results computed against the previous store can no longer be looked up
+        self._generation += 1
+        self._result_cache.clear()
+
+    def encoder_stats(self):
+        """Embedding scheduler counters and batch-size / queue-depth histograms."""
+        return self._encoder.stats()
+
+    def stage_stats(self):
+        """Per-stage timings {"ingest"|"query": {"stages": {stage: {"calls", "seconds",
+           "max_seconds", "items"}}, "counters": {name: n}}} since construction.
+           Ingestion stages: hash, pdf2docx, split (in the worker pool), infer_access_tag,
+           encode, faiss_add, faiss_remove, faiss_train, lexical_index, persist and the
+           whole update. Query phases: fuzzy, lexical, semantic (encode + faiss_search +
+           rerank or two_stage), role_filter, authorization and formatting."""
+        return self._metrics.snapshot()
+
+    def export_metrics(self, fmt="json"):
+        """Stage timings, cache and encoder counters as a JSON document or, with
+           fmt="prometheus", in the Prometheus text exposition format."""
+        if fmt == "prometheus":
+            lines = [self._metrics.prometheus().rstrip("\n")]
+            caches = self.cache_stats()
+            for kind in ("hits", "misses"):
+                lines.append(f"# TYPE complimate_lite_cache_{kind}_total counter")
+                for cache in ("results", "prompt_embeddings"):
+                    lines.append(f'complimate_lite_cache_{kind}_total{{cache="{cache}"}} {caches[cache][kind]}')
+            encoder = self.encoder_stats()
+            for kind in ("batches", "texts"):
+                lines.append(f"# TYPE complimate_lite_encoder_{kind}_total counter")
+                lines.append(f"complimate_lite_encoder_{kind}_total {encoder[kind]}")
+            return "\n".join(lines) + "\n"
+        if fmt != "json":
+            raise ValueError(f"Unknown metrics format {fmt!r}, expected 'json' or 'prometheus'")
+        return json.dumps({"stages": self.stage_stats(), "caches": self.cache_stats(),
+                           "encoder": self.encoder_stats()}, indent=2)
+
+    @staticmethod
+    @contextmanager
+    def profile(path=None, sort="cumulative", limit=30):
+        """cProfile the calling thread for the duration of the block, e.g.
+           `with CompliMateLite.profile("ingest.prof"): CompliMateLite()`.
+           Stats are dumped to path if given, else the top `limit` entries are printed."""
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+            if path:
+                profiler.dump_stats(path)
+            else:
+                pstats.Stats(profiler).sort_stats(sort).print_stats(limit)
+
+    def cache_stats(self):
+        """Hit/miss counters and sizes of the result and prompt embedding caches."""
+        return {"results": self._result_cache.stats(), "prompt_embeddings": self._prompt_vec_cache.stats(),
+                "generation": self._generation}
+
+    def _rerank_exact(self, qvecs, D, I, top_k):
+        # re-score candidates of a compressed index with the float32 vectors kept on disk
+        # in the embedding cache; candidates without a cached vector keep their approximate score
+        out_d = np.full((len(qvecs), top_k), -np.inf, dtype="float32")
+        out_i = np.full((len(qvecs), top_k), -1, dtype="int64")
+        for row, (q, scores, ids) in enumerate(zip(qvecs, D, I)):
+            scores = scores.astype("float32").copy()
+            if self._emb_matrix is not None:
+                positions = [self.paragraphs.position(int(vector_id)) if vector_id >= 0 else None for vector_id in ids]
+                known = np.flatnonzero([pos is not None for pos in positions])
+                rows = self._embedding_index().lookup(self.paragraphs.keys[[positions[j] for j in known]])
+                for j, offset in zip(known, rows):
+                    if offset >= 0:
+                        vec = np.asarray(self._emb_matrix[offset], dtype="float32")
+                        scores[j] = float(vec @ q) / max(float(np.linalg.norm(vec)), 1e-12)
+            order = np.argsort(-scores, kind="stable")[:top_k]
+            out_d[row, :len(order)] = scores[order]
+            out_i[row, :len(order)] = ids[order]
+        return out_d, out_i
+
+    def search(self, prompt, user_role, top_k=5):
+        """Structured retrieval: authorized SearchHit records for prompt, fuzzy heading
+           matches first, then paragraph matches (dense search fused with BM25 unless
+           hybrid=False), one hit per section. Use get_section() for content and render_hits() for the chat markdown."""
+        return self.search_many([prompt], user_role, top_k=top_k)[0]
+
+    def search_many(self, prompts, user_role, top_k=5):
+        """search() for many prompts at once.
+           Prompts are encoded in one batch and searched with a single multi-row FAISS
+           call; prompts that normalize alike share one result."""
+        return [list(entry["hits"]) for entry in self._search_entries(list(prompts), user_role, top_k)]
+
+    def _search_entries(self, prompts, user_role, top_k, render=False):
+        # result cache entries {"hits", "response"} per prompt; misses are searched together.
+        # Readers share the lock, so concurrent queries only wait for a store swap.
+        self._ready.wait()
+        with self._state_lock.read():
+            keys = [self._result_key(prompt, user_role, top_k) for prompt in prompts]
+            entries, todo = {}, {}
+            for prompt, key in zip(prompts, keys):
+                if key in entries or key in todo:
+                    continue
+                entry = self._result_cache.get(key)
+                if entry is None:
+                    todo[key] = prompt
+                else:
+                    entries[key] = entry
+
+            metrics = self._metrics
+            metrics.count("query", "prompts", len(prompts))
+            metrics.count("query", "result_cache_hits", len(entries))
+            if todo:
+                sem_results = self._paragraph_scored_many(list(todo.values()), top_k=top_k, user_role=user_role)
+                for (key, prompt), sem in zip(todo.items(), sem_results):
+                    start = time.perf_counter()
+                    heading_matches = self._heading_fuzzy_scored(prompt, threshold=HEADING_FUZZY_THRESHOLD)
+                    metrics.record("query", "fuzzy", time.perf_counter() - start, len(heading_matches))
+                    with metrics.time("query", "authorization", len(heading_matches) + len(sem)):
+                        hits = tuple(self._collect_hits(heading_matches, sem, user_role))
+                    entries[key] = {"hits": hits, "response": None}
+                    self._result_cache.put(key, entries[key])
+            if render:  # against the store the hits came from
+                for entry in entries.values():
+                    if entry["response"] is None:
+                        with metrics.time("query", "formatting", len(entry["hits"])):
+                            self._render_entry(entry)
+            return [entries[key] for key in keys]
+
+    def _render_entry(self, entry):
+        # rendered markdown is cached alongside the hits
+        if entry["response"] is None:
+            entry["response"] = self._render_hits_locked(entry["hits"])
+        return entry["response"]
+
+    def get_section(self, section_id):
+        """Meta entry (filename, heading, content, access_tag) of a hit's section, or None."""
+        pos = self._meta_pos.get(section_id)
+        return self.meta[pos] if pos is not None else None
 
     def query(self, prompt, user_role, top_k=5):
-        # Phase 1: Fuzzy heading matches
-        heading_matches = self._heading_fuzzy_matches(prompt, threshold=HEADING_FUZZY_THRESHOLD)
-        fuzzy_results = []
+        return self._search_entries([prompt], user_role, top_k, render=True)[0]["response"]
+
+    def query_many(self, prompts, user_role, top_k=5):
+        """Run query() for many prompts at once (see search_many).
+           Returns one dict per prompt with its 'hits' and the 'response' markdown that
+           query() returns for it."""
+        prompts = list(prompts)
+        return [{"prompt": prompt, "hits": list(entry["hits"]), "response": entry["response"]}
+                for prompt, entry in zip(prompts, self._search_entries(prompts, user_role, top_k, render=True))]
+
+    async def aquery(self, prompt, user_role, top_k=5, executor=None):
+        """Coroutine version of query(); runs on executor (default: the loop's thread pool).
+           Concurrent calls search in parallel and share micro-batched prompt encodes."""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(executor, functools.partial(self.query, prompt, user_role, top_k))
+
+    def _collect_hits(self, heading_matches, sem_results, user_role):
+        # Phase 1: Fuzzy heading matches, Phase 2: Semantic matches;
+        # authorized and deduplicated by section
+        hits = []
         seen_sections = set()
 
-        for entry in heading_matches:
+        for ratio, entry in heading_matches:
             sec_id = (entry['filename'], entry['heading'])
             if sec_id not in seen_sections and self._is_authorized(user_role, entry['heading']):
-                fuzzy_results.append({
-                    'filename': entry['filename'],
-                    'section_heading': entry['heading'],
-                    'section_content': entry['content'],
-                    'access_tag': entry.get('access_tag', 'shared')
-                })
+                hits.append(SearchHit(entry['filename'], entry['heading'], entry['id'], ratio,
+                                      "fuzzy", entry.get('access_tag', 'shared')))
                 seen_sections.add(sec_id)
 
-        # Phase 2: Semantic matches
-        sem_results = self._semantic_paragraph_search(prompt, top_k=top_k)
-        semantic_results = []
-        for para in sem_results:
-            sec_id = (para['filename'], para['section_heading'])
-            if sec_id not in seen_sections and self._is_authorized(user_role, para['section_heading']):
-                semantic_results.append({
-                    'filename': para['filename'],
-                    'section_heading': para['section_heading'],
-                    'section_content': para['section_content'],
-                    'access_tag': para.get('access_tag', 'shared')
-                })
+        for score, pos, phase in sem_results:
+            section = self.get_section(int(self.paragraphs.section_ids[pos]))
+            if section is None:
+                continue
+            sec_id = (section['filename'], section['heading'])
+            if sec_id not in seen_sections and self._is_authorized(user_role, section['heading']):
+                hits.append(SearchHit(section['filename'], section['heading'], section['id'], score,
+                                      phase, section.get('access_tag', 'shared')))
                 seen_sections.add(sec_id)
 
-        if not fuzzy_results and not semantic_results:
-            return "No relevant sections found."
+        return hits
+
+    def render_hits(self, hits):
+        """Render hits as the markdown answer shown in the chat UI.
+           Hits whose section was removed or renumbered by an update since the search
+           are left out."""
+        with self._state_lock.read():
+            return self._render_hits_locked(hits)
 
+    def _render_hits_locked(self, hits):
         output_parts = []
-        if fuzzy_results:
-            output_parts.append(self._format_response(fuzzy_results))
-        if semantic_results:
-            output_parts.append(self._format_response(semantic_results))
+        # heading matches first, then paragraph matches (semantic / lexical) in rank order
+        for is_fuzzy in (True, False):
+            results = []
+            for hit in hits:
+                if (hit.phase == "fuzzy") != is_fuzzy:
+                    continue
+                section = self.get_section(hit.section_id)
+                if section is None or (section["filename"], section["heading"]) != (hit.filename, hit.heading):
+                    continue
+                results.append({
+                    'filename': hit.filename,
+                    'section_heading': hit.heading,
+                    'section_content': section['content'],
+                })
+            if results:
+                output_parts.append(self._format_response(results))
 
+        if not output_parts:
+            return "No relevant sections found."
         return "\n\n".join(output_parts)
 
 
@@ -606,3 +3084,52 @@ class CompliMateLite:
         return docx_path
 
 
+# ------------------------
+# Ingestion workers
+# ------------------------
+
+def _stat_record(st, digest, algo=FILE_DIGEST, checked_ns=None):
+    # processed_lite.json entry: the stat signature a file was hashed under, and its digest
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns, "hash": digest, "algo": algo,
+            "checked_ns": time.time_ns() if checked_ns is None else checked_ns}
+
+
+def _ingest_pool_context():
+    # see INGEST_START_METHOD; the fork server imports this module once, so workers of later
+    # pools fork with it loaded instead of importing faiss / torch again
+    context = multiprocessing.get_context(INGEST_START_METHOD)
+    if INGEST_START_METHOD == "forkserver":
+        context.set_forkserver_preload(["__main__", __name__])
+    return context
+
+
+def _prepare_source(fullpath, known):
+    """Hash, convert and parse one source file; runs inside the ingestion process pool.
+       known is the file's processed_lite.json record, if any.
+       Returns (status, record, docx_path, sections, timings) with status one of
+       "unchanged", "error", "failed" (PDF conversion) or "ok", and timings
+       {stage: (seconds, items)} for the stages that ran."""
+    parser = CompliMateLite.__new__(CompliMateLite)  # parsing helpers need no model/index state
+    timings = {}
+    start = time.perf_counter()
+    try:
+        changed, record = parser._file_record(fullpath, known)
+    except Exception as e:
+        print(f"[ERROR] Failed hashing {fullpath}: {e}")
+        return "error", None, None, None, timings
+    timings["hash"] = (time.perf_counter() - start, 1)
+    if not changed:
+        return "unchanged", record, None, None, timings
+
+    if fullpath.lower().endswith(".pdf"):
+        start = time.perf_counter()
+        docx_path = parser._convert_pdf_to_docx(fullpath)
+        timings["pdf2docx"] = (time.perf_counter() - start, 1)
+        if not docx_path:
+            return "failed", record, None, None, timings
+    else:
+        docx_path = fullpath
+    start = time.perf_counter()
+    sections = parser._split_into_sections(docx_path)
+    timings["split"] = (time.perf_counter() - start, len(sections))
+    return "ok", record, docx_path, sections, timings
@@ -68,9 +68,10 @@ def chat_bubble(message, sender="user"):
 st.set_page_config(page_title=BOT_NAME, layout="wide")
 set_background(BACKGROUND_IMAGE)
 
-# Initialize backend once
+# Initialize backend once per session; all sessions share one process-wide model and index set
+# (lazy: the page renders while indexes load / build in the background)
 if "complimate_lite" not in st.session_state:
-    st.session_state.complimate_lite = CompliMateLite()
+    st.session_state.complimate_lite = CompliMateLite.shared(lazy=True)
 
 # --- OVERLAY IMAGE ---
 st.markdown(
@@ -136,8 +137,12 @@ if query:
     # Add user message
     st.session_state.messages.append({"sender": "user", "message": query})
 
-    # Get backend answer
-    bot_result = st.session_state.complimate_lite.query(query, user_role=topic)
+    # Get backend answer (waits for the first index build on a cold start)
+    backend = st.session_state.complimate_lite
+    if not backend.is_ready():
+        with st.spinner("Preparing the compliance documents, this happens only on first start..."):
+            backend.wait_until_ready()
+    bot_result = backend.query(query, user_role=topic)
 
     #Prepend custom intro message
     intro_msg="Here are the relevant sections based on your query:\n\n"
@@ -0,0 +1,100 @@
+"""Compare batched role inference against the old per-keyword loop, including identical tags.
+
+Usage:
+    python benchmarks/bench_access_tags.py --headings 3000
+    python benchmarks/bench_access_tags.py --headings 48000 --vocab 20000 --skip-legacy
+
+By default headings draw from a small domain vocabulary, so most of them are near
+duplicates of each other; --vocab N draws Zipf-distributed words from N synthetic
+terms plus a stop-word, closer to the headings of real documents.
+"""
+import argparse
+import copy
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+import CompliMate_Lite  # noqa: E402
+from CompliMate_Lite import CompliMateLite, KEYWORD_SIM_THRESHOLD  # noqa: E402
+
+WORDS = ("storage", "petroleum", "class", "licence", "form", "safety", "distance", "tank", "pump",
+         "outfit", "kerosene", "decanting", "approval", "inspection", "vent", "valve", "pipeline",
+         "refinery", "jetty", "import", "carriage", "road", "rule", "schedule", "fire", "fighting",
+         "retail", "bulk", "containers", "emergency", "shut-off", "competent", "person", "tpia")
+STOP_WORDS = ("of", "and", "the", "for", "in", "to")
+
+
+def synthetic_headings(n, seed=7, vocab=0):
+    rng = random.Random(seed)
+    terms = [f"term{i}" for i in range(vocab)]
+    weights = [1 / (i + 1) for i in range(vocab)]
+    headings = []
+    for i in range(n):
+        if headings and rng.random() < 0.1:
+            headings.append(rng.choice(headings))  # repeated headings are common in real documents
+            continue
+        if vocab:
+            words = rng.choices(terms, weights, k=rng.randint(2, 6))
+            words.insert(rng.randint(0, len(words)), rng.choice(STOP_WORDS))
+        else:
+            words = rng.sample(WORDS, rng.randint(1, 6))
+        if rng.random() < 0.4:
+            words.insert(0, f"Rule {rng.randint(1, 300)}")
+        headings.append(" ".join(words).title())
+    return headings
+
+
+def legacy_infer_access_tag(bot, heading, role_map, shared):
+    """The pre-index implementation (on private copies of the role maps), kept here only for comparison."""
+    max_sim = 0.0
+    best_role = None
+    for role, keywords in role_map.items():
+        for keyword in keywords:
+            sim = bot._keyword_similarity(heading, keyword)
+            if sim > max_sim:
+                max_sim = sim
+                best_role = role
+    if max_sim >= KEYWORD_SIM_THRESHOLD:
+        return best_role
+    if heading not in shared:
+        shared.append(heading)
+        for role in role_map:
+            if heading not in role_map[role]:
+                role_map[role].append(heading)
+    return "shared"
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--headings", type=int, default=3000)
+    parser.add_argument("--per-document", type=int, default=200)
+    parser.add_argument("--vocab", type=int, default=0, help="Zipf vocabulary size (0 -> small domain vocabulary)")
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    # no model / index needed for role inference
+    bot = CompliMateLite.__new__(CompliMateLite)
+    headings = synthetic_headings(args.headings, vocab=args.vocab)
+    documents = [headings[i:i + args.per_document] for i in range(0, len(headings), args.per_document)]
+    role_map, shared = copy.deepcopy(CompliMate_Lite.ROLE_FILE_MAP), list(CompliMate_Lite.shared_items)
+    print(f"{len(headings)} headings in {len(documents)} documents, {sum(map(len, role_map.values()))} keywords")
+
+    t0 = time.perf_counter()
+    new = [tag for doc in documents for tag in bot._infer_access_tags(doc)]
+    t_new = time.perf_counter() - t0
+    print(f"batched index: {t_new:.3f}s ({new.count('shared')} shared, "
+          f"{sum(map(len, CompliMate_Lite.ROLE_FILE_MAP.values()))} keywords after)")
+
+    if not args.skip_legacy:
+        t0 = time.perf_counter()
+        old = [legacy_infer_access_tag(bot, h, role_map, shared) for h in headings]
+        t_old = time.perf_counter() - t0
+        print(f"legacy loop:   {t_old:.3f}s")
+        print(f"identical tags: {old == new}, identical role maps: {role_map == CompliMate_Lite.ROLE_FILE_MAP}")
+        print(f"speedup:        {t_old / t_new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
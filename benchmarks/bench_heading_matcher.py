@@ -0,0 +1,74 @@
+"""Micro-benchmark the indexed heading matcher against a full SequenceMatcher scan.
+
+Usage:
+    python benchmarks/bench_heading_matcher.py --headings 50000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+from difflib import SequenceMatcher
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from CompliMate_Lite import CompliMateLite, HEADING_FUZZY_THRESHOLD  # noqa: E402
+
+WORDS = ("storage", "petroleum", "class", "licence", "form", "safety", "distance", "tank", "pump",
+         "outfit", "kerosene", "decanting", "approval", "inspection", "vent", "valve", "pipeline",
+         "refinery", "jetty", "import", "carriage", "road", "rule", "schedule", "fire", "fighting")
+QUERIES = ("Form XIV", "safety distance", "storage of petroleum class b", "Emergency Vent",
+           "rule 116", "decanting kerosene", "pipeline approvals", "fire fighting facilities")
+
+
+def synthetic_meta(n, seed=7):
+    rng = random.Random(seed)
+    meta = []
+    for i in range(n):
+        words = rng.sample(WORDS, rng.randint(2, 6))
+        if rng.random() < 0.3:
+            words.insert(0, f"Rule {rng.randint(1, 200)}")
+        meta.append({"filename": f"doc{i % 300}.docx", "heading": " ".join(words).title(),
+                     "content": "", "access_tag": "shared"})
+    return meta
+
+
+def legacy_matches(meta, query, threshold=HEADING_FUZZY_THRESHOLD):
+    """The pre-index implementation, kept here only for comparison."""
+    q = query.strip().lower()
+    matches = []
+    for entry in meta:
+        h_lower = entry.get("heading", "").lower()
+        ratio = SequenceMatcher(None, q, h_lower).ratio()
+        if q in h_lower or ratio >= threshold:
+            matches.append((ratio, entry))
+    matches.sort(key=lambda x: x[0], reverse=True)
+    return [e for _, e in matches]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--headings", type=int, default=50000)
+    args = parser.parse_args()
+
+    # no model / FAISS needed for heading matching
+    bot = CompliMateLite.__new__(CompliMateLite)
+    bot.meta = synthetic_meta(args.headings)
+
+    t0 = time.perf_counter()
+    bot._build_heading_index()
+    print(f"{args.headings} headings, index build: {time.perf_counter() - t0:.3f}s")
+
+    for query in QUERIES:
+        t0 = time.perf_counter()
+        new = bot._heading_fuzzy_matches(query)
+        t_new = time.perf_counter() - t0
+        t0 = time.perf_counter()
+        old = legacy_matches(bot.meta, query)
+        t_old = time.perf_counter() - t0
+        same = [id(e) for e in new] == [id(e) for e in old]
+        print(f"{query!r:32} indexed {t_new * 1000:8.2f} ms | scan {t_old * 1000:8.2f} ms | "
+              f"{len(new):5} hits | identical: {same}")
+
+
+if __name__ == "__main__":
+    main()
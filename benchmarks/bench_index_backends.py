@@ -0,0 +1,83 @@
+"""Recall@k vs latency of the FAISS index backends, measured against the exact flat index.
+
+Usage:
+    python benchmarks/bench_index_backends.py --vectors 100000 --dim 384 --k 5
+"""
+import argparse
+import os
+import sys
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from CompliMate_Lite import CompliMateLite, DEFAULT_INDEX_PARAMS, INDEX_BACKENDS  # noqa: E402
+
+
+def synthetic_vectors(n, dim, n_topics=200, seed=7):
+    """Clustered unit vectors, closer to sentence embeddings than uniform noise."""
+    rng = np.random.default_rng(seed)
+    topics = rng.standard_normal((n_topics, dim)).astype("float32")
+    vecs = topics[rng.integers(0, n_topics, n)] + 0.6 * rng.standard_normal((n, dim)).astype("float32")
+    faiss.normalize_L2(vecs)
+    return vecs
+
+
+def build(backend, vecs, params):
+    # only the index helpers are used, so no model / RAG folder is needed
+    bot = CompliMateLite.__new__(CompliMateLite)
+    bot.index_backend = backend
+    bot.index_params = dict(DEFAULT_INDEX_PARAMS, **params)
+    index_obj = bot._new_index(vecs.shape[1])
+    index_obj.add_with_ids(vecs, np.arange(len(vecs), dtype="int64"))
+    return bot._finalize_index(index_obj)
+
+
+def recall_at_k(found, truth):
+    return np.mean([len(set(f) & set(t)) / len(t) for f, t in zip(found, truth)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vectors", type=int, default=100000)
+    parser.add_argument("--dim", type=int, default=384)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    vecs = synthetic_vectors(args.vectors + args.queries, args.dim)
+    base, queries = vecs[:args.vectors], vecs[args.vectors:]
+    print(f"{args.vectors} vectors x {args.dim} dims, {args.queries} queries, recall@{args.k} vs flat")
+
+    truth = None
+    sweeps = {
+        "flat": [{}],
+        "hnsw": [{"ef_search": ef} for ef in (16, 32, 64, 128)],
+        "ivf_flat": [{"nprobe": p} for p in (1, 4, 16, 64)],
+        "ivf_pq": [{"nprobe": p} for p in (1, 4, 16, 64)],
+    }
+    for backend in INDEX_BACKENDS:
+        t0 = time.perf_counter()
+        index_obj = build(backend, base, {})
+        t_build = time.perf_counter() - t0
+        for params in sweeps[backend]:
+            bot = CompliMateLite.__new__(CompliMateLite)
+            bot.index_params = dict(DEFAULT_INDEX_PARAMS, **params)
+            bot._tune_index(index_obj)
+            # one query at a time, as the app issues them
+            found = []
+            t0 = time.perf_counter()
+            for q in queries:
+                _, idx = index_obj.search(q[None, :], args.k)
+                found.append(idx[0])
+            latency = (time.perf_counter() - t0) / len(queries)
+            if truth is None:
+                truth = found
+            label = ", ".join(f"{k}={v}" for k, v in params.items()) or "exact"
+            print(f"{backend:9} {label:14} build {t_build:7.2f}s | {latency * 1000:7.3f} ms/query | "
+                  f"recall@{args.k} {recall_at_k(found, truth):.3f}")
+
+
+if __name__ == "__main__":
+    main()
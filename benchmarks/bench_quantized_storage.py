@@ -0,0 +1,77 @@
+"""Memory saved vs recall lost for the compressed index storage modes, on the bundled corpus.
+
+Every mode indexes RAG_folder_lite (the Petroleum Rules SOP) with the real model;
+embeddings are computed once and copied into each mode's META folder. Recall@k is
+measured against the float32 flat index, with and without exact reranking.
+
+Usage:
+    python benchmarks/bench_quantized_storage.py --k 5 --rerank 50
+"""
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from CompliMate_Lite import CompliMateLite, INDEX_STORAGE  # noqa: E402
+
+QUERIES = ("Form XIV", "safety distance", "storage of petroleum class B", "emergency vent",
+           "Rule 116", "decanting kerosene", "pipeline approvals", "fire fighting facilities",
+           "licence renewal", "competent person", "tank lorry", "import of petroleum")
+
+
+def top_ids(bot, prompts, k):
+    return [[int(bot.paragraphs.ids[pos]) for _, pos in hits]
+            for hits in bot._semantic_paragraph_scored_many(prompts, top_k=k)]
+
+
+def recall(found, truth):
+    return np.mean([len(set(f) & set(t)) / max(len(t), 1) for f, t in zip(found, truth)])
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rag", default=os.path.join(os.path.dirname(__file__), "..", "RAG_folder_lite"))
+    parser.add_argument("--backend", default="flat")
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--rerank", type=int, default=50)
+    parser.add_argument("--pq-bits", type=int, default=4, help="small corpora cannot train 8-bit codebooks")
+    parser.add_argument("--sample-queries", type=int, default=200, help="paragraphs reused as extra queries")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        ref_meta = os.path.join(tmp, "reference")
+        ref = CompliMateLite(args.rag, ref_meta, index_backend="flat", progress=lambda *a: None)
+        rng = np.random.default_rng(0)
+        picks = rng.choice(len(ref.paragraphs), min(args.sample_queries, len(ref.paragraphs)), replace=False)
+        prompts = list(QUERIES) + [ref.paragraphs.text(int(p)) for p in picks]
+        truth = top_ids(ref, prompts, args.k)
+        print(f"{len(ref.paragraphs)} paragraphs, {len(prompts)} queries, backend {args.backend}, recall@{args.k}")
+
+        for storage in INDEX_STORAGE:
+            meta = os.path.join(tmp, storage)
+            os.makedirs(meta)
+            for name in ("embedding_cache_lite.f32", "embedding_cache_lite.keys", "embedding_cache_lite.json"):
+                shutil.copy(os.path.join(ref_meta, name), meta)
+            bot = CompliMateLite(args.rag, meta, index_backend=args.backend,
+                                 index_params={"storage": storage, "pq_bits": args.pq_bits},
+                                 progress=lambda *a: None)
+            size = len(faiss.serialize_index(bot.paragraph_index))
+            t0 = time.perf_counter()
+            approx = recall(top_ids(bot, prompts, args.k), truth)
+            t_approx = (time.perf_counter() - t0) / len(prompts)
+            bot.index_params["rerank"] = args.rerank
+            t0 = time.perf_counter()
+            exact = recall(top_ids(bot, prompts, args.k), truth)
+            t_exact = (time.perf_counter() - t0) / len(prompts)
+            print(f"{storage:8} index {size / 1024:9.1f} KiB | recall {approx:.3f} ({t_approx * 1000:.2f} ms/query) | "
+                  f"rerank@{args.rerank} {exact:.3f} ({t_exact * 1000:.2f} ms/query)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+"""Compare the single-pass section walker against the old per-element lookup.
+
+Usage:
+    python benchmarks/bench_split_sections.py --sections 2000 --paras 8
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from docx import Document
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+from CompliMate_Lite import CompliMateLite  # noqa: E402
+
+
+def build_docx(path, n_sections, paras_per_section, table_every=5):
+    doc = Document()
+    for s in range(n_sections):
+        doc.add_heading(f"Rule {s} - Storage of Petroleum Class B", level=2)
+        for p in range(paras_per_section):
+            doc.add_paragraph(f"Paragraph {p} of rule {s}: licensed premises shall maintain safety distance.")
+        if table_every and s % table_every == 0:
+            table = doc.add_table(rows=3, cols=3)
+            for r, row in enumerate(table.rows):
+                for c, cell in enumerate(row.cells):
+                    cell.text = f"r{r}c{c}"
+    doc.save(path)
+
+
+def legacy_split_into_sections(bot, filepath):
+    """The pre-walker implementation, kept here only for comparison."""
+    doc = Document(filepath)
+    sections = []
+    current_heading = "Introduction"
+    current_content = []
+    for el in list(doc.element.body.iterchildren()):
+        if el.tag.endswith("}p"):
+            para = next((p for p in doc.paragraphs if p._element == el), None)
+            if not para:
+                continue
+            if bot._is_heading(para):
+                if current_content:
+                    sections.append((current_heading, "\n".join(current_content)))
+                current_heading = para.text.strip()
+                current_content = []
+            else:
+                current_content.append(para.text.strip())
+        elif el.tag.endswith("}tbl"):
+            table = next((t for t in doc.tables if t._element == el), None)
+            if table:
+                rows = [" | ".join(cell.text.strip() for cell in row.cells) for row in table.rows]
+                current_content.append("\n".join(rows))
+    if current_content:
+        sections.append((current_heading, "\n".join(current_content)))
+    return sections
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--sections", type=int, default=500)
+    parser.add_argument("--paras", type=int, default=8)
+    parser.add_argument("--skip-legacy", action="store_true")
+    args = parser.parse_args()
+
+    # no model / index needed for parsing
+    bot = CompliMateLite.__new__(CompliMateLite)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "synthetic.docx")
+        build_docx(path, args.sections, args.paras)
+        print(f"Synthetic docx: {args.sections} sections x {args.paras} paragraphs")
+
+        t0 = time.perf_counter()
+        new = bot._split_into_sections(path)
+        t_new = time.perf_counter() - t0
+        print(f"single-pass walker: {t_new:.3f}s ({len(new)} sections)")
+
+        if not args.skip_legacy:
+            t0 = time.perf_counter()
+            old = legacy_split_into_sections(bot, path)
+            t_old = time.perf_counter() - t0
+            print(f"legacy lookup:      {t_old:.3f}s ({len(old)} sections)")
+            print(f"identical output:   {old == new}")
+            print(f"speedup:            {t_old / t_new:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""Offline benchmark and relevance-regression suite.
+
+Builds a synthetic .docx corpus (headings, paragraphs and tables, as _split_into_sections
+reads them), ingests it and reports per-stage ingestion timings, the cost of a one-file
+update, cold start in a fresh process, peak memory, index size on disk and query()
+p50/p99. It then indexes the bundled Petroleum Rules 2002 SOP and scores recall@k / MRR
+against the labelled queries in sop_queries.json. The model is loaded from the local
+cache only (pass --online to allow downloads). Results are printed and, with --out,
+written as JSON for trend comparison.
+
+Usage:
+    python benchmarks/bench_suite.py --docs 20 --sections 100 --out bench.json
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from docx import Document
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+REPO = os.path.dirname(HERE)
+sys.path.insert(0, REPO)
+
+WORDS = ("storage", "petroleum", "class", "licence", "form", "safety", "distance", "tank", "pump",
+         "outfit", "kerosene", "decanting", "approval", "inspection", "vent", "valve", "pipeline",
+         "refinery", "jetty", "import", "carriage", "road", "rule", "schedule", "fire", "fighting",
+         "controller", "premises", "vehicle", "container", "capacity", "litres", "drawing", "fee")
+PROMPTS = ("Form XIV", "safety distance", "storage of petroleum class B", "emergency vent",
+           "Rule 116", "decanting kerosene", "pipeline approvals", "fire fighting facilities",
+           "licence renewal fee", "tank lorry carriage by road", "import of petroleum", "jetty inspection")
+
+COLD_START = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {repo!r})
+from CompliMate_Lite import CompliMateLite
+imported = time.perf_counter()
+bot = CompliMateLite({rag!r}, {meta!r}, lazy={lazy}, progress=lambda *a: None, **{kwargs!r})
+constructed = time.perf_counter()
+bot.wait_until_ready()
+bot.query({prompt!r}, "retail")
+answered = time.perf_counter()
+try:
+    import resource
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+except ImportError:
+    rss = None
+print(json.dumps({{"import_s": imported - start, "construct_s": constructed - imported,
+                  "first_query_s": answered - constructed, "total_s": answered - start, "peak_rss_mb": rss}}))
+"""
+
+
+def sentence(rng, n_words):
+    return " ".join(rng.choice(WORDS) for _ in range(n_words)).capitalize() + "."
+
+
+def build_corpus(folder, n_docs, n_sections, n_paras, table_every=5, seed=7):
+    rng = random.Random(seed)
+    os.makedirs(folder, exist_ok=True)
+    for d in range(n_docs):
+        doc = Document()
+        for s in range(n_sections):
+            doc.add_heading(f"Rule {d * n_sections + s} - {sentence(rng, rng.randint(2, 6))[:-1]}", level=2)
+            for _ in range(n_paras):
+                doc.add_paragraph(" ".join(sentence(rng, rng.randint(6, 14)) for _ in range(rng.randint(1, 3))))
+            if table_every and s % table_every == 0:
+                table = doc.add_table(rows=3, cols=3)
+                for row in table.rows:
+                    for cell in row.cells:
+                        cell.text = sentence(rng, 2)
+        doc.save(os.path.join(folder, f"synthetic_{d:04d}.docx"))
+
+
+def folder_mb(folder):
+    return sum(os.path.getsize(os.path.join(folder, f)) for f in os.listdir(folder)) / 2 ** 20
+
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError:  # not on Windows
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def ingest(CompliMateLite, rag, meta, kwargs):
+    t0 = time.perf_counter()
+    bot = CompliMateLite(rag, meta, progress=lambda *a: None, **kwargs)
+    wall = time.perf_counter() - t0
+    stages = {name: dict(values, per_second=values["items"] / values["seconds"] if values["seconds"] else None)
+              for name, values in bot.stage_stats().get("ingest", {}).get("stages", {}).items()}
+    return bot, {"wall_s": wall, "sections": len(bot.meta), "paragraphs": len(bot.paragraphs),
+                 "paragraphs_per_second": len(bot.paragraphs) / wall, "stages": stages}
+
+
+def update_one_file(bot, rag):
+    # append a section to one document and time the incremental update
+    path = os.path.join(rag, sorted(os.listdir(rag))[0])
+    doc = Document(path)
+    doc.add_heading("Rule 99999 - Appended section", level=2)
+    doc.add_paragraph("Appended paragraph about licence renewal for petroleum storage.")
+    doc.save(path)
+    t0 = time.perf_counter()
+    bot.update_index()
+    return {"wall_s": time.perf_counter() - t0}
+
+
+def cold_start(rag, meta, lazy, kwargs):
+    code = COLD_START.format(repo=REPO, rag=rag, meta=meta, lazy=lazy, kwargs=kwargs, prompt=PROMPTS[0])
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def latency(bot, prompts, role, repeats):
+    times = []
+    for _ in range(repeats):
+        for prompt in prompts:
+            t0 = time.perf_counter()
+            bot.query(prompt, role)
+            times.append(time.perf_counter() - t0)
+    ms = np.array(times) * 1000
+    return {"queries": len(ms), "p50_ms": float(np.percentile(ms, 50)), "p99_ms": float(np.percentile(ms, 99)),
+            "mean_ms": float(ms.mean())}
+
+
+def relevance(bot, labels, ks):
+    """recall@k (share of a query's relevant sections among its first k hits, averaged)
+       and MRR; a hit is relevant if its heading starts with one of the labelled prefixes."""
+    recalls = {k: [] for k in ks}
+    reciprocal_ranks, misses = [], []
+    for label in labels:
+        headings = [hit.heading.lower() for hit in bot.search(label["query"], label["role"], top_k=max(ks))]
+        prefixes = [p.lower() for p in label["relevant"]]
+        ranks = [next((i for i, h in enumerate(headings) if h.startswith(p)), None) for p in prefixes]
+        for k in ks:
+            recalls[k].append(sum(r is not None and r < k for r in ranks) / len(prefixes))
+        found = [r for r in ranks if r is not None]
+        reciprocal_ranks.append(1 / (min(found) + 1) if found else 0.0)
+        if not found:
+            misses.append(label["query"])
+    return {"queries": len(labels), **{f"recall@{k}": float(np.mean(v)) for k, v in recalls.items()},
+            "mrr": float(np.mean(reciprocal_ranks)), "misses": misses}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--sections", type=int, default=100, help="sections per document")
+    parser.add_argument("--paras", type=int, default=6, help="paragraphs per section")
+    parser.add_argument("--backend", default="flat")
+    parser.add_argument("--index-params", default="{}", help="JSON overrides for DEFAULT_INDEX_PARAMS")
+    parser.add_argument("--no-hybrid", action="store_true")
+    parser.add_argument("--repeats", type=int, default=20, help="latency passes over the prompt set")
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5])
+    parser.add_argument("--labels", default=os.path.join(HERE, "sop_queries.json"))
+    parser.add_argument("--skip-cold-start", action="store_true")
+    parser.add_argument("--online", action="store_true", help="allow model downloads")
+    parser.add_argument("--out", help="write the results as JSON here")
+    args = parser.parse_args()
+
+    if not args.online:
+        # must be set before sentence-transformers is imported
+        os.environ.setdefault("HF_HUB_OFFLINE", "1")
+        os.environ.setdefault("TRANSFORMERS_OFFLINE", "1")
+    import faiss
+    from CompliMate_Lite import CompliMateLite  # noqa: E402
+
+    kwargs = {"index_backend": args.backend, "index_params": json.loads(args.index_params),
+              "hybrid": not args.no_hybrid}
+    results = {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+               "versions": {"python": platform.python_version(), "numpy": np.__version__,
+                            "faiss": getattr(faiss, "__version__", None)},
+               "config": dict(vars(args), kwargs=kwargs)}
+
+    with tempfile.TemporaryDirectory() as tmp:
+        rag, meta = os.path.join(tmp, "rag"), os.path.join(tmp, "meta")
+        t0 = time.perf_counter()
+        build_corpus(rag, args.docs, args.sections, args.paras)
+        results["corpus"] = {"docs": args.docs, "sections_per_doc": args.sections, "paras_per_section": args.paras,
+                             "build_s": time.perf_counter() - t0, "size_mb": folder_mb(rag)}
+        print(f"Synthetic corpus: {args.docs} docs x {args.sections} sections x {args.paras} paragraphs")
+
+        bot, results["ingest"] = ingest(CompliMateLite, rag, meta, kwargs)
+        print(f"ingest: {results['ingest']['wall_s']:.2f}s, {results['ingest']['paragraphs']} paragraphs "
+              f"({results['ingest']['paragraphs_per_second']:.0f}/s)")
+        for name, stage in sorted(results["ingest"]["stages"].items(), key=lambda kv: -kv[1]["seconds"]):
+            print(f"  {name:18} {stage['seconds']:8.3f}s  {stage['calls']:6} calls  {stage['items']:8} items")
+        results["update_one_file"] = update_one_file(bot, rag)
+        print(f"one-file update: {results['update_one_file']['wall_s']:.3f}s")
+        results["index_size_mb"] = folder_mb(meta)
+
+        results["query"] = {}
+        for name, cache_kwargs in (("uncached", {"query_cache_size": 0, "prompt_cache_size": 0}), ("cached", {})):
+            qbot = CompliMateLite(rag, meta, progress=lambda *a: None, **kwargs, **cache_kwargs)
+            results["query"][name] = latency(qbot, PROMPTS, "retail", args.repeats)
+            print(f"query ({name}): p50 {results['query'][name]['p50_ms']:.2f} ms, "
+                  f"p99 {results['query'][name]['p99_ms']:.2f} ms")
+        results["query"]["stages"] = qbot.stage_stats().get("query", {})
+
+        if not args.skip_cold_start:
+            results["cold_start"] = {mode: cold_start(rag, meta, mode == "lazy", kwargs) for mode in ("eager", "lazy")}
+            for mode, cold in results["cold_start"].items():
+                print(f"cold start ({mode}): construct {cold['construct_s']:.2f}s, first answer after "
+                      f"{cold['total_s']:.2f}s, peak RSS {cold['peak_rss_mb'] or 0:.0f} MB")
+        results["peak_rss_mb"] = peak_rss_mb()
+
+    with open(args.labels, "r", encoding="utf-8") as f:
+        labels = json.load(f)
+    with tempfile.TemporaryDirectory() as tmp:
+        sop = CompliMateLite(os.path.join(REPO, "RAG_folder_lite"), tmp, progress=lambda *a: None, **kwargs)
+        results["relevance"] = relevance(sop, labels, args.k)
+    print("relevance: " + ", ".join(f"{key} {value:.3f}" for key, value in results["relevance"].items()
+                                    if key.startswith("recall") or key == "mrr"))
+
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()